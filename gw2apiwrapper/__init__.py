@@ -1,3 +1,4 @@
 from gw2apiwrapper.globalapi import GlobalAPI
 from gw2apiwrapper.accountapi import AccountAPI
 from gw2apiwrapper.tradingpost import GW2TP
+from gw2apiwrapper.aio import AsyncGlobalAPI, AsyncAccountAPI, AsyncGW2TP
@@ -1,16 +1,21 @@
 import urllib.parse
 import concurrent.futures as cc
-from collections import namedtuple
-from gw2apiwrapper.functions import getJson, typer
+from gw2apiwrapper import records, threads
+from gw2apiwrapper.functions import (authScope, fetchChunks, fetchPages,
+                                     getJson, typer)
 import gw2apiwrapper.descriptions as eps
 
 
 class AccountAPI:
-    def __init__(self, api_key):
+    def __init__(self, api_key, executor=None):
         '''
         Initalize various bits of account information.
+
+        Takes an optional executor (see gw2apiwrapper.threads) used for
+        the concurrent bulk requests. Defaults to the shared one.
         '''
         self.api_key = api_key
+        self.executor = executor
         self.header = {'Authorization': 'Bearer ' + self.api_key}
         self.url = 'https://api.guildwars2.com/v2/'
 
@@ -24,11 +29,11 @@ class AccountAPI:
         self.world = data['world']
         self.guilds = data['guilds']
 
-    def getJson(self, api):
+    def getJson(self, api, meta=False, fresh=False):
         '''
         Simple wrapper for less typing.
         '''
-        return getJson(self.url + api, self.header)
+        return getJson(self.url + api, self.header, meta=meta, fresh=fresh)
 
     def checkPermission(self, apiName):
         '''
@@ -88,9 +93,8 @@ class AccountAPI:
 
         # Build our tuple.
         jsonData = self.getJson('guild/{}'.format(guildID))
-        obj = namedtuple('Guild', jsonData.keys())
 
-        return obj(**jsonData)
+        return records.build('Guild', jsonData)
 
     @typer
     def getDungeons(self):
@@ -423,20 +427,21 @@ class AccountAPI:
                 specObjs = []
 
                 # This is ugly, but it cut run time in HALF.
-                # Get a thread pool going to speed this object up.
-                with cc.ThreadPoolExecutor(max_workers=10) as executor:
-                    # PEP8
-                    caller = eps.Specialization
+                # Use the thread pool to speed this object up.
+                executor = threads.getExecutor(self)
 
-                    # Submit our function to the pool.
-                    cmd = {executor.submit(caller, x): x for x in JSON}
+                # PEP8
+                caller = eps.Specialization
 
-                    # Append as they complete.
-                    for future in cc.as_completed(cmd):
-                        try:
-                            specObjs.append(future.result())
-                        except Exception as e:  # pragma: no cover
-                            print('Error: ', e)
+                # Submit our function to the pool.
+                cmd = {executor.submit(caller, x): x for x in JSON}
+
+                # Append as they complete.
+                for future in cc.as_completed(cmd):
+                    try:
+                        specObjs.append(future.result())
+                    except Exception as e:  # pragma: no cover
+                        print('Error: ', e)
 
                 # Trait list. [[id,id,id], [id,id,id], [id,id,id]]
                 traitList = [x['traits'] for x in buildJSON[area]]
@@ -476,19 +481,20 @@ class AccountAPI:
             specObjs = []
 
             # This is ugly, but it cut run time in HALF.
-            # Get a thread pool going to speed this object up.
-            with cc.ThreadPoolExecutor(max_workers=10) as executor:
-                # PEP8 pls
-                caller = eps.Specialization
-                # Submit our function to the pool.
-                cmd = {executor.submit(caller, x): x for x in JSON}
+            # Use the thread pool to speed this object up.
+            executor = threads.getExecutor(self)
 
-                # Append as they complete.
-                for future in cc.as_completed(cmd):
-                    try:
-                        specObjs.append(future.result())
-                    except Exception as e:  # pragma: no cover
-                        print('Error: ', e)
+            # PEP8 pls
+            caller = eps.Specialization
+            # Submit our function to the pool.
+            cmd = {executor.submit(caller, x): x for x in JSON}
+
+            # Append as they complete.
+            for future in cc.as_completed(cmd):
+                try:
+                    specObjs.append(future.result())
+                except Exception as e:  # pragma: no cover
+                    print('Error: ', e)
 
             # Trait list.
             traitList = [x['traits'] for x in buildJSON]
@@ -508,17 +514,22 @@ class AccountAPI:
             # BUILDS
             return(build)
 
-    def getMatchResults(self, matchID):
+    def getMatchResults(self, matchID, paged=False):
         '''
         Get the results for a match(s) from the
         Guild Wars 2 API.
 
-        To get all matches, pass "all"
+        To get all matches, pass "all". With paged=True, they're
+        fetched a page at a time (see functions.fetchPages).
 
         Returns PVPMatch Object(s).
         '''
         self.checkPermission('pvp')
 
+        if matchID == 'all' and paged:
+            return fetchPages(self.getJson, 'pvp/games', 'PVPMatch',
+                              executor=threads.getExecutor(self))
+
         if type(matchID) is str:
             # Build the ID string.
             if matchID == 'all':
@@ -528,39 +539,21 @@ class AccountAPI:
 
             # Get the JSON
             jsonData = self.getJson(gameSTR)
-            obj = namedtuple('PVPMatch', jsonData[0].keys())
 
             # Make the objects.
             matches = []
             for match in jsonData:
-                try:
-                    matches.append(obj(**match))
-                except TypeError:
-                    # Very likely missing or adding new attributes.
-                    temp_obj = namedtuple('PVPMatch', match.keys())
-                    matches.append(temp_obj(**match))
+                matches.append(records.build('PVPMatch', match))
 
             return(matches)
 
         # A list of IDs.
         elif type(matchID) is list:
-            # Empty match list for later.
-            matches = []
-
-            # Build a list broken into 200.
-            # This isn't nesscary as of 09/08/2015
-            # Never hurts to be prepared though.
-            safeIDs = [matchID[x:x + 200] for x in range(0, len(matchID), 200)]
-
-            for safe in safeIDs:
-                # Build the list.
-                cleanStr = ','.join(str(x) for x in safe)
-
-                cleanURL = 'pvp/games?ids={}'.format(cleanStr)
-
-                for match in self.getJson(cleanURL):
-                    obj = namedtuple('PVPMatch', match.keys())
-                    matches.append(obj(**match))
+            # Chunked by 200 and fetched concurrently.
+            matches = fetchChunks(self.getJson, 'pvp/games', matchID,
+                                  'PVPMatch',
+                                  executor=threads.getExecutor(self),
+                                  scope=authScope(self))
 
             # Return objects.
             return(matches)
@@ -0,0 +1,572 @@
+import ssl
+import time
+import asyncio
+import weakref
+import email.parser
+import http.client
+import urllib.parse
+from gw2apiwrapper import functions, records, transport
+from gw2apiwrapper.functions import (ApiResponse, attachObjects, authScope,
+                                     blamesIDs, checkChunk, decode, idsURL,
+                                     noteMissing, orderResults, typer)
+from gw2apiwrapper.globalapi import GlobalAPI
+from gw2apiwrapper.accountapi import AccountAPI
+from gw2apiwrapper.tradingpost import GW2TP
+
+
+class AsyncTransport:
+    '''
+    The asyncio take on transport.ConnectionPool. Speaks just
+    enough HTTP/1.1 over asyncio streams to talk to the API,
+    keeping connections alive per host.
+
+    limit   - (int) Requests allowed in flight at once.
+    maxsize - (int) Idle connections kept around per host.
+    timeout - (int) Seconds to wait on any one request.
+
+    Connections belong to the event loop that opened them,
+    so use one transport per loop.
+    '''
+    def __init__(self, limit=16, maxsize=10, timeout=30):
+        self.limit = limit
+        self.maxsize = maxsize
+        self.timeout = timeout
+
+        # (scheme, host, port) -> list of idle (reader, writer).
+        self._idle = {}
+
+        # Made on first use, inside the running loop.
+        self._semaphore = None
+
+    async def _open(self, key):
+        scheme, host, port = key
+
+        if scheme == 'https':
+            context = ssl.create_default_context()
+            port = port or 443
+        else:
+            context = None
+            port = port or 80
+
+        return await asyncio.open_connection(host, port, ssl=context)
+
+    def _checkin(self, key, conn):
+        idle = self._idle.setdefault(key, [])
+        if len(idle) < self.maxsize:
+            idle.append(conn)
+        else:
+            conn[1].close()
+
+    def close(self):
+        '''
+        Close every idle connection.
+        '''
+        idle, self._idle = self._idle, {}
+
+        for conns in idle.values():
+            for reader, writer in conns:
+                writer.close()
+
+    async def request(self, url, header=None):
+        '''
+        GET the given URL over a pooled connection.
+
+        Returns a transport.Response.
+        '''
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.limit)
+
+        parts = urllib.parse.urlsplit(url)
+        key = (parts.scheme, parts.hostname, parts.port)
+
+        path = parts.path or '/'
+        if parts.query:
+            path = '{}?{}'.format(path, parts.query)
+
+        async with self._semaphore:
+            while True:
+                idle = self._idle.get(key)
+                reused = bool(idle)
+
+                if reused:
+                    conn = idle.pop()
+                else:
+                    conn = await asyncio.wait_for(self._open(key),
+                                                  self.timeout)
+
+                try:
+                    response, keepAlive = await asyncio.wait_for(
+                        self._exchange(conn, parts.netloc, path, header),
+                        self.timeout
+                    )
+                except (OSError, asyncio.TimeoutError,
+                        asyncio.IncompleteReadError, ValueError):
+                    conn[1].close()
+
+                    # Same deal as ConnectionPool: a stale keep-alive
+                    # connection gets another go on a fresh one.
+                    if reused:
+                        continue
+                    raise
+
+                if keepAlive:
+                    self._checkin(key, conn)
+                else:
+                    conn[1].close()
+
+                return response
+
+    async def _exchange(self, conn, host, path, header):
+        '''
+        Send one GET and read the whole response back.
+
+        Returns a tuple of (Response, keepAlive).
+        '''
+        reader, writer = conn
+
+        lines = ['GET {} HTTP/1.1'.format(path),
+                 'Host: {}'.format(host),
+                 'Accept: application/json',
+                 'Connection: keep-alive']
+
+        for name, value in (header or {}).items():
+            lines.append('{}: {}'.format(name, value))
+
+        writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1'))
+        await writer.drain()
+
+        statusLine = await reader.readline()
+        if not statusLine:
+            raise ConnectionResetError('Connection closed by server')
+
+        version, status, *reason = statusLine.decode('latin-1').split(None, 2)
+        status = int(status)
+        reason = reason[0].strip() if reason else ''
+
+        block = await reader.readuntil(b'\r\n\r\n')
+        parser = email.parser.BytesParser(_class=http.client.HTTPMessage)
+        headers = parser.parsebytes(block)
+
+        keepAlive = (version == 'HTTP/1.1' and
+                     headers.get('Connection', '').lower() != 'close')
+
+        if status in (204, 304) or 100 <= status < 200:
+            body = b''
+
+        elif 'chunked' in headers.get('Transfer-Encoding', '').lower():
+            pieces = []
+            while True:
+                size = int((await reader.readline()).split(b';')[0], 16)
+                if size == 0:
+                    # Skip any trailers.
+                    while (await reader.readline()) not in (b'\r\n', b''):
+                        pass
+                    break
+
+                pieces.append(await reader.readexactly(size))
+                await reader.readexactly(2)
+
+            body = b''.join(pieces)
+
+        elif headers.get('Content-Length') is not None:
+            body = await reader.readexactly(int(headers['Content-Length']))
+
+        else:
+            # No length, so the body ends when the connection does.
+            body = await reader.read()
+            keepAlive = False
+
+        return transport.Response(status, reason, headers, body), keepAlive
+
+
+# One shared transport per event loop, for clients without their own.
+_shared = weakref.WeakKeyDictionary()
+
+
+def getTransport():
+    '''
+    The shared AsyncTransport for the running event loop.
+    '''
+    loop = asyncio.get_event_loop()
+
+    conn = _shared.get(loop)
+    if conn is None:
+        conn = _shared[loop] = AsyncTransport()
+
+    return conn
+
+
+# Requests in flight per event loop: {requestKey: Task}. See fetch.
+_flights = weakref.WeakKeyDictionary()
+
+
+async def fetch(url, header=None, conn=None):
+    '''
+    The asyncio version of transport.fetch. Shares the same rate
+    limiter and retry settings.
+
+    Like transport.fetch, identical requests made at the same time
+    on the same event loop are coalesced into one when
+    transport.coalesce is set. Everyone gets the same Response.
+    '''
+    if not transport.coalesce:
+        return await _fetch(url, header, conn)
+
+    flights = _flights.setdefault(asyncio.get_event_loop(), {})
+    key = transport.requestKey(url, header)
+
+    flight = flights.get(key)
+    if flight is None:
+        flight = flights[key] = asyncio.ensure_future(
+            _fetch(url, header, conn)
+        )
+
+        def done(task):
+            # Done; the next caller starts a fresh request.
+            if flights.get(key) is task:
+                del flights[key]
+
+            # Whoever's still waiting gets it; don't warn if nobody is.
+            if not task.cancelled():
+                task.exception()
+
+        flight.add_done_callback(done)
+
+    # One caller giving up doesn't cancel it for everyone else.
+    return await asyncio.shield(flight)
+
+
+async def _fetch(url, header, conn):
+    if conn is None:
+        conn = getTransport()
+
+    for attempt in range(transport.retries + 1):
+        wait = transport.limiter.reserve()
+        while wait:
+            await asyncio.sleep(wait)
+            wait = transport.limiter.reserve()
+
+        try:
+            response = await conn.request(url, header)
+        except (OSError, asyncio.TimeoutError,
+                asyncio.IncompleteReadError, ValueError) as e:
+            if attempt == transport.retries:
+                raise transport.giveUp(url, error=e) from e
+            await asyncio.sleep(transport.retryDelay(None, attempt))
+            continue
+
+        delay = transport.retryDelay(response, attempt)
+        if delay is None:
+            return response
+
+        if attempt == transport.retries:
+            raise transport.giveUp(url, response)
+
+        # Too many requests is everyone's problem, not just ours.
+        if response.status == 429:
+            transport.limiter.pause(delay)
+        else:
+            await asyncio.sleep(delay)
+
+
+async def cached(url, header=None):
+    '''
+    The asyncio version of functions.cached. The disk cache can
+    check the build with the API, so it's used off the event loop.
+    '''
+    diskCache = functions.diskCache
+    if diskCache is not None and diskCache.cacheable(url, header):
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(None, functions.cached, url,
+                                          header)
+
+    if functions.responseCache is None:
+        return None
+
+    return functions.responseCache.get(url, header)
+
+
+async def store(url, header, response):
+    '''
+    The asyncio version of functions.store, writing to the disk
+    cache off the event loop.
+    '''
+    if functions.responseCache is not None:
+        functions.responseCache.put(url, header, response)
+
+    diskCache = functions.diskCache
+    if diskCache is not None:
+        loop = asyncio.get_event_loop()
+        await loop.run_in_executor(None, diskCache.put, url, header,
+                                   response)
+
+
+async def getJson(url, header=None, conn=None, meta=False, fresh=False):
+    '''
+    The asyncio version of functions.getJson.
+    '''
+    if ' ' in url:
+        # Leave the query's structure (and anything quoted) alone.
+        url = urllib.parse.quote(url, safe='/:?=&,%')
+
+    start = time.monotonic()
+
+    # Same caches as the threaded clients.
+    response = None if fresh else await cached(url, header)
+    hit = response is not None
+
+    if not hit:
+        response = await fetch(url, header, conn)
+        await store(url, header, response)
+
+    if not meta:
+        return decode(response, url)
+
+    return ApiResponse(response, url, time.monotonic() - start, hit)
+
+
+async def fetchChunk(caller, url, ids, scope=''):
+    '''
+    The asyncio version of functions.fetchChunk.
+    '''
+    ids = [str(x) for x in ids]
+    if functions.badIDs is not None:
+        ids = [x for x in ids if not functions.badIDs.known(url, x, scope)]
+
+    if not ids:
+        return []
+
+    response = await caller(idsURL(url, ids), meta=True)
+    if response.status == 404 and blamesIDs(response):
+        # None of them exist.
+        noteMissing(url, ids, [], scope)
+        return []
+
+    if checkChunk(response):
+        if len(ids) == 1:
+            return []
+
+        half = len(ids) // 2
+        return (await fetchChunk(caller, url, ids[:half], scope) +
+                await fetchChunk(caller, url, ids[half:], scope))
+
+    noteMissing(url, ids, response.data, scope)
+    return response.data
+
+
+async def fetchChunks(caller, url, ids, name, mapping=False, scope=''):
+    '''
+    The asyncio version of functions.fetchChunks. Every chunk is
+    requested at once; the transport's limit keeps it sane.
+    '''
+    # The API treats 35 and '35' the same, so we do too.
+    unique = list(dict.fromkeys(str(x) for x in ids))
+    safeList = [unique[x:x + 200] for x in range(0, len(unique), 200)]
+
+    results = await asyncio.gather(*(
+        fetchChunk(caller, url, safe, scope) for safe in safeList
+    ))
+
+    objects = [records.build(name, thing)
+               for data in results for thing in data]
+
+    return orderResults(objects, unique, name, mapping)
+
+
+class atyper(typer):
+    '''
+    typer for the asyncio clients. Takes the same int, str,
+    list and 'all' arguments, but the method returns a
+    coroutine. Lists and 'all' take the 'mapping' keyword.
+    '''
+    async def __call__(self, obj, *args, mapping=False):
+        name = self.crossList[self.api]['obj']
+
+        # Dirty, but effective...?
+        if 'AccountAPI' in str(obj):
+            return await self._account(obj)
+
+        # HAHAHA TEST COVERAGE IS WHY THIS EXISTS. NUMBERS GAME BAYBEE
+        self.f(obj, 'TEST COVERAGE')
+
+        args, = args
+
+        if args == 'all':
+            ids = await obj.getJson(self.url)
+
+        elif isinstance(args, list):
+            ids = args
+
+        elif isinstance(args, (int, str)):
+            jsonData = await obj.getJson('{}/{}'.format(self.url, args))
+            return records.build(name, jsonData)
+
+        else:
+            raise NotImplementedError(
+                '@typer does not support {}'.format(type(args))
+            )
+
+        return await fetchChunks(obj.getJson, self.url, ids, name, mapping)
+
+    async def _account(self, obj):
+        '''
+        See typer._account.
+        '''
+        # We do this to check for permissions!
+        self.f(obj)
+
+        objName = self.crossList[self.api]['obj']
+
+        if self.api != 'characters':
+            data = await obj.getJson('account/{}'.format(self.api))
+        else:
+            data = await obj.getJson(self.api)
+
+        if any(isinstance(x, dict) for x in data):
+            # getBank can return None.
+            built = await fetchChunks(obj.getJson, self.url,
+                                      [part['id'] for part in data if part],
+                                      objName, mapping=True,
+                                      scope=authScope(obj))
+
+            objects = attachObjects(data, built)
+
+        else:
+            objects = await fetchChunks(obj.getJson, self.url, data, objName,
+                                        scope=authScope(obj))
+
+        setattr(obj, self.api, objects)
+
+        return objects
+
+
+def _asyncMethods(cls):
+    '''
+    atyper versions of every typer method on cls.
+    '''
+    return {name: atyper(attr.f) for name, attr in vars(cls).items()
+            if isinstance(attr, typer)}
+
+
+class AsyncGlobalAPI:
+    '''
+    asyncio version of GlobalAPI. Every typer method (getItem,
+    getSkin, ...) is here and returns a coroutine.
+    '''
+    def __init__(self, conn=None):
+        '''
+        Takes an optional AsyncTransport. Defaults to the shared one
+        for the running event loop.
+        '''
+        self.url = 'https://api.guildwars2.com/v2/'
+        self.conn = conn
+
+    async def getJson(self, api, meta=False, fresh=False):
+        '''
+        Simple wrapper for less typing.
+        '''
+        return await getJson(self.url + api, None, self.conn, meta, fresh)
+
+    async def getDailies(self, tomorrow=False):
+        '''
+        See GlobalAPI.getDailies.
+        '''
+        if tomorrow:
+            jsonData = await self.getJson('achievements/daily/tomorrow')
+        else:
+            jsonData = await self.getJson('achievements/daily')
+
+        idList = [data['id'] for value in jsonData.values() for data in value]
+
+        return await self.getAchievement(idList)
+
+
+class AsyncAccountAPI:
+    '''
+    asyncio version of AccountAPI. Every typer method (getBank,
+    getSkins, ...) is here and returns a coroutine.
+
+    Use 'await AsyncAccountAPI.create(key)', or call and
+    await load() yourself, before anything else.
+    '''
+    def __init__(self, api_key, conn=None):
+        '''
+        Takes an optional AsyncTransport. Defaults to the shared one
+        for the running event loop.
+        '''
+        self.api_key = api_key
+        self.header = {'Authorization': 'Bearer ' + self.api_key}
+        self.url = 'https://api.guildwars2.com/v2/'
+        self.conn = conn
+        self.permissions = []
+
+    @classmethod
+    async def create(cls, api_key, conn=None):
+        '''
+        Build and load() an AsyncAccountAPI in one go.
+        '''
+        self = cls(api_key, conn)
+        await self.load()
+        return self
+
+    async def load(self):
+        '''
+        Fetch the key's permissions and the account details.
+        '''
+        data = await self.getJson('tokeninfo')
+        self.permissions = data['permissions']
+
+        data = await self.getJson('account/')
+
+        self.accountID = data['id']
+        self.username = data['name']
+        self.world = data['world']
+        self.guilds = data['guilds']
+
+    async def getJson(self, api, meta=False, fresh=False):
+        '''
+        Simple wrapper for less typing.
+        '''
+        return await getJson(self.url + api, self.header, self.conn, meta,
+                             fresh)
+
+    checkPermission = AccountAPI.checkPermission
+
+
+class AsyncGW2TP:
+    '''
+    asyncio version of GW2TP. getListings and getPrices
+    return coroutines.
+    '''
+    def __init__(self, conn=None):
+        '''
+        Takes an optional AsyncTransport. Defaults to the shared one
+        for the running event loop.
+        '''
+        self.url = 'https://api.guildwars2.com/v2/commerce/'
+        self.conn = conn
+
+    async def getJson(self, api, meta=False, fresh=False):
+        '''
+        Simple wrapper for less typing.
+        '''
+        return await getJson(self.url + api, None, self.conn, meta, fresh)
+
+    async def getExchange(self, coin_or_gems, quantity):
+        '''
+        See GW2TP.getExchange.
+        '''
+        urls = {'coin': 'exchange/coins?quantity=',
+                'gems': 'exchange/gems?quantity='}
+
+        if coin_or_gems not in urls:
+            raise ValueError('First arg must be "coin" or "gems"')
+
+        return await self.getJson('{}{}'.format(urls[coin_or_gems], quantity))
+
+
+for _sync, _async in ((GlobalAPI, AsyncGlobalAPI),
+                      (AccountAPI, AsyncAccountAPI),
+                      (GW2TP, AsyncGW2TP)):
+    for _name, _method in _asyncMethods(_sync).items():
+        setattr(_async, _name, _method)
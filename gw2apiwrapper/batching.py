@@ -0,0 +1,157 @@
+import threading
+import concurrent.futures as cc
+from gw2apiwrapper import records, threads
+
+
+# Batches currently open, per thread: {id(client): [Batch, ...]}
+_local = threading.local()
+
+
+def current(obj):
+    '''
+    The innermost batch open for a client in this thread, or None.
+    '''
+    stack = getattr(_local, 'batches', {}).get(id(obj))
+    return stack[-1] if stack else None
+
+
+class Lookup(cc.Future):
+    '''
+    A Future for one batched ID. Asking for the result of one that
+    hasn't been sent yet sends its batch, so waiting inside the
+    with block never hangs.
+    '''
+    def __init__(self, batch):
+        super().__init__()
+        self._batch = batch
+
+    def result(self, timeout=None):
+        if not self.done():
+            self._batch.flush()
+
+        return super().result(timeout)
+
+    def exception(self, timeout=None):
+        if not self.done():
+            self._batch.flush()
+
+        return super().exception(timeout)
+
+
+class Batch:
+    '''
+    Collects single ID lookups (eg. getItem(12452)) made on a
+    client and sends them as bulk ?ids= requests instead.
+
+    Use it through the client:
+
+        with api.batch():
+            sword = api.getItem(30699)
+            bar = api.getItem(12452)
+
+        sword.result().name
+
+    Inside the block, single ID typer calls return Futures. IDs are
+    sent per endpoint once 'size' of them are waiting, once
+    'window' seconds have passed since the first one (if given), or
+    when the block ends, whichever comes first. Each caller gets
+    its own object; IDs the API doesn't know raise ValueError.
+
+    Only the thread that opened the block is batched.
+    '''
+    def __init__(self, obj, window=None, size=200):
+        self.obj = obj
+        self.window = window
+        self.size = size
+
+        # url -> (object name, {id string: [Lookups]})
+        self._pending = {}
+        self._timer = None
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        batches = _local.__dict__.setdefault('batches', {})
+        batches.setdefault(id(self.obj), []).append(self)
+        return self
+
+    def __exit__(self, *exc):
+        batches = _local.batches
+        stack = batches[id(self.obj)]
+        stack.remove(self)
+        if not stack:
+            del batches[id(self.obj)]
+
+        self.flush()
+
+    def add(self, url, name, itemID):
+        '''
+        Queue itemID for the endpoint url, building 'name' objects.
+
+        Returns a Lookup (a Future) for the object.
+        '''
+        lookup = Lookup(self)
+
+        with self._lock:
+            ids = self._pending.setdefault(url, (name, {}))[1]
+            ids.setdefault(str(itemID), []).append(lookup)
+
+            full = len(ids) >= self.size
+            if full:
+                ready = {url: self._pending.pop(url)}
+
+            elif self.window and self._timer is None:
+                self._timer = threading.Timer(self.window, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+        if full:
+            self._send(ready)
+
+        return lookup
+
+    def flush(self):
+        '''
+        Send everything waiting now.
+        '''
+        with self._lock:
+            ready, self._pending = self._pending, {}
+
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+
+        self._send(ready)
+
+    def _send(self, ready):
+        executor = threads.getExecutor(self.obj)
+
+        for url, (name, ids) in ready.items():
+            items = list(ids.items())
+
+            # The API's limit is 200 per request.
+            for x in range(0, len(items), 200):
+                chunk = dict(items[x:x + 200])
+                executor.submit(self._fetch, url, name, chunk)
+
+    def _fetch(self, url, name, ids):
+        # functions imports us.
+        from gw2apiwrapper.functions import authScope, fetchChunk
+
+        try:
+            data = fetchChunk(self.obj.getJson, url, list(ids),
+                              authScope(self.obj))
+            found = {str(thing['id']): thing for thing in data}
+        except BaseException as e:
+            for lookups in ids.values():
+                for lookup in lookups:
+                    lookup.set_exception(e)
+            return
+
+        for itemID, lookups in ids.items():
+            for lookup in lookups:
+                if itemID in found:
+                    lookup.set_result(records.build(name, found[itemID]))
+                else:
+                    lookup.set_exception(ValueError(
+                        'Likely bad ID: {} | URL: {}'.format(itemID, url)
+                    ))
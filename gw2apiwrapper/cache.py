@@ -0,0 +1,352 @@
+import os
+import time
+import shutil
+import hashlib
+import tempfile
+import threading
+import urllib.parse
+from collections import OrderedDict
+from http.client import HTTPMessage
+from gw2apiwrapper.transport import Response, requestKey
+
+
+# Handy TTLs, in seconds.
+MINUTE = 60
+HOUR = 60 * MINUTE
+DAY = 24 * HOUR
+
+
+def lookup(policies, url, default=None):
+    '''
+    Find the policy for the endpoint a URL points at, by the
+    longest matching path prefix (relative to /v2/).
+    '''
+    path = urllib.parse.urlsplit(url).path
+
+    # Everything after the version is the endpoint.
+    if '/v2/' in path:
+        path = path.split('/v2/', 1)[1]
+
+    segments = path.strip('/').split('/')
+    for end in range(len(segments), 0, -1):
+        policy = policies.get('/'.join(segments[:end]))
+        if policy is not None:
+            return policy
+
+    return default
+
+
+class ResponseCache:
+    '''
+    A thread-safe in-memory cache of API responses with a TTL
+    per endpoint and LRU eviction.
+
+    policies   - (dict) Endpoint path (relative to /v2/) to TTL
+                 in seconds. The longest matching prefix wins, so
+                 'achievements/daily' can differ from 'achievements'.
+    default    - (int) TTL for endpoints with no policy. 0 means
+                 don't cache them at all.
+    maxEntries - (int) Most responses to keep.
+    maxBytes   - (int) Most response body bytes to keep.
+
+    Only successful responses are cached. The raw body is what's
+    stored, so every hit decodes to fresh objects nobody else
+    can have modified.
+    '''
+    def __init__(self, policies=None, default=0, maxEntries=10000,
+                 maxBytes=64 * 1024 * 1024):
+        self.policies = dict(policies or {})
+        self.default = default
+        self.maxEntries = maxEntries
+        self.maxBytes = maxBytes
+
+        # key -> (expires, response)
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def ttlFor(self, url):
+        '''
+        The TTL, in seconds, for the endpoint the URL points at.
+        '''
+        return lookup(self.policies, url, self.default)
+
+    def get(self, url, header=None):
+        '''
+        Returns the cached Response, or None on a miss.
+        '''
+        key = requestKey(url, header)
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+
+            expires, response = entry
+            if expires <= time.monotonic():
+                self._drop(key)
+                return None
+
+            self._entries.move_to_end(key)
+            return response
+
+    def put(self, url, header, response):
+        '''
+        Store a Response, if it's cacheable.
+        '''
+        if not 200 <= response.status < 300:
+            return
+
+        ttl = self.ttlFor(url)
+        if ttl <= 0 or len(response.body) > self.maxBytes:
+            return
+
+        key = requestKey(url, header)
+
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+
+            self._entries[key] = (time.monotonic() + ttl, response)
+            self._bytes += len(response.body)
+
+            # Least recently used goes first.
+            while (len(self._entries) > self.maxEntries or
+                   self._bytes > self.maxBytes):
+                self._drop(next(iter(self._entries)))
+
+    def _drop(self, key):
+        expires, response = self._entries.pop(key)
+        self._bytes -= len(response.body)
+
+    def clear(self):
+        '''
+        Forget everything.
+        '''
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class NegativeCache:
+    '''
+    Remembers IDs an endpoint said don't exist, so bulk and single
+    lookups can skip them instead of asking again.
+
+    Entries are kept per auth scope (see transport.requestKey), since
+    what's missing for one API key can be there for another.
+
+    ttl        - (int) Seconds to remember a bad ID for. They can
+                 turn up in a later build, so not forever.
+    maxEntries - (int) Most IDs to remember, oldest dropped first.
+    '''
+    def __init__(self, ttl=HOUR, maxEntries=100000):
+        self.ttl = ttl
+        self.maxEntries = maxEntries
+
+        # (scope, url, id string) -> expires
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add(self, url, ids, scope=''):
+        '''
+        Remember ids as bad for the endpoint url.
+        '''
+        expires = time.monotonic() + self.ttl
+
+        with self._lock:
+            for itemID in ids:
+                key = (scope, url, str(itemID))
+                self._entries.pop(key, None)
+                self._entries[key] = expires
+
+            while len(self._entries) > self.maxEntries:
+                self._entries.popitem(last=False)
+
+    def known(self, url, itemID, scope=''):
+        '''
+        True if itemID is a known bad ID for the endpoint url.
+        '''
+        key = (scope, url, str(itemID))
+
+        with self._lock:
+            expires = self._entries.get(key)
+            if expires is None:
+                return False
+
+            if expires <= time.monotonic():
+                del self._entries[key]
+                return False
+
+            return True
+
+    def clear(self):
+        '''
+        Forget everything.
+        '''
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+# Static catalogs that only change with a game build.
+STATIC = {
+    'items': True,
+    'skins': True,
+    'recipes': True,
+    'itemstats': True,
+    'masteries': True,
+    'achievements': True,
+
+    # Lives under achievements/, but changes every day.
+    'achievements/daily': False,
+}
+
+
+class DiskCache:
+    '''
+    An on-disk cache of static catalog responses, kept per game
+    build, so restarts don't have to download everything again.
+
+    path       - (str) Directory to keep the cache in.
+    endpoints  - (dict) Endpoint path to True/False for whether
+                 it's cached, by longest matching prefix.
+                 Defaults to STATIC.
+    checkEvery - (int) Seconds between checks for a new build.
+    getBuild   - (callable) Returns the current build ID.
+                 Defaults to functions.getBuild.
+
+    Entries for the current build are served without touching
+    the network. Once the build changes, the old build's entries
+    are thrown out, along with everything in
+    functions.responseCache (see newBuild). Authenticated
+    responses are never stored.
+    '''
+    def __init__(self, path, endpoints=None, checkEvery=5 * MINUTE,
+                 getBuild=None):
+        self.path = os.path.expanduser(path)
+        self.endpoints = dict(STATIC if endpoints is None else endpoints)
+        self.checkEvery = checkEvery
+
+        if getBuild is None:
+            # Imported here, functions imports us.
+            from gw2apiwrapper.functions import getBuild
+
+        self.getBuild = getBuild
+
+        self._build = None
+        self._checked = 0.0
+        self._lock = threading.Lock()
+
+    def cacheable(self, url, header=None):
+        '''
+        True if url (asked for with header) is kept on disk.
+        '''
+        if header and header.get('Authorization'):
+            return False
+
+        return lookup(self.endpoints, url, False)
+
+    def build(self):
+        '''
+        The current build ID, checking the API at most once every
+        checkEvery seconds. Clears out stale builds when it changes.
+        '''
+        with self._lock:
+            fresh = time.monotonic() - self._checked < self.checkEvery
+            if self._build is not None and fresh:
+                return self._build
+
+        # Not under the lock; it's a network call.
+        build = self.getBuild()
+
+        with self._lock:
+            self._checked = time.monotonic()
+
+            changed = build != self._build
+            if changed:
+                self._build = build
+                self._prune(build)
+
+        if changed:
+            self.newBuild(build)
+
+        return build
+
+    def newBuild(self, build):
+        '''
+        Called when build() sees a build ID it hasn't before.
+        Empties functions.responseCache, so copies of the old
+        build's catalogs aren't served from memory either.
+        '''
+        # Imported here, functions imports us.
+        from gw2apiwrapper import functions
+
+        if functions.responseCache is not None:
+            functions.responseCache.clear()
+
+    def _prune(self, build):
+        '''
+        Delete every build's directory but this one.
+        '''
+        if not os.path.isdir(self.path):
+            return
+
+        # Only touch what looks like ours.
+        for name in os.listdir(self.path):
+            if name.isdigit() and name != str(build):
+                shutil.rmtree(os.path.join(self.path, name),
+                              ignore_errors=True)
+
+    def _file(self, url):
+        name = hashlib.sha1(repr(requestKey(url)).encode('UTF-8')).hexdigest()
+        return os.path.join(self.path, str(self.build()), name + '.json')
+
+    def get(self, url, header=None):
+        '''
+        Returns the cached Response, or None on a miss.
+        '''
+        if not self.cacheable(url, header):
+            return None
+
+        try:
+            with open(self._file(url), 'rb') as f:
+                body = f.read()
+        except OSError:
+            return None
+
+        # Only successes are ever written.
+        return Response(200, 'OK', HTTPMessage(), body)
+
+    def put(self, url, header, response):
+        '''
+        Store a Response, if it's cacheable.
+        '''
+        if response.status != 200 or not self.cacheable(url, header):
+            return
+
+        filename = self._file(url)
+        os.makedirs(os.path.dirname(filename), exist_ok=True)
+
+        # Write then rename, so a reader never sees half a file.
+        fd, temp = tempfile.mkstemp(suffix='.tmp',
+                                    dir=os.path.dirname(filename))
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(response.body)
+
+            os.replace(temp, filename)
+        except BaseException:
+            os.unlink(temp)
+            raise
+
+    def clear(self):
+        '''
+        Forget everything.
+        '''
+        shutil.rmtree(self.path, ignore_errors=True)
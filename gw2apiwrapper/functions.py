@@ -1,9 +1,110 @@
+import re
 import json
+import time
+import types
+import functools
 import urllib.parse
-import urllib.request
 from functools import singledispatch
-from collections import namedtuple
 import concurrent.futures as cc
+from gw2apiwrapper import batching, cache, records, threads, transport
+
+
+# This dictionary provides an easy way for me to direct
+# what kind of data I want from endpoints. The 'obj' names
+# are looked up in records.schemas to build the objects.
+crossList = {
+    'skins': {'url': 'skins', 'obj': 'Skin'},
+    'dyes': {'url': 'colors', 'obj': 'Dye'},
+    'minis': {'url': 'minis', 'obj': 'Mini'},
+    'bank': {'url': 'items', 'obj': 'Item'},
+    'materials': {'url': 'items', 'obj': 'Material'},
+    'materialcategories': {'url': 'materials', 'obj': 'MaterialCategory'},
+    'professions': {'url': 'professions', 'obj': 'Profession'},
+    'races': {'url': 'races', 'obj': 'Race'},
+    'pets': {'url': 'pets', 'obj': 'Pet'},
+    'masteries': {'url': 'masteries', 'obj': 'Mastery'},
+    'inventory': {'url': 'items', 'obj': 'Item'},
+    'outfits': {'url': 'outfits', 'obj': 'Outfit'},
+    'titles': {'url': 'titles', 'obj': 'Title'},
+    'recipes': {'url': 'recipes', 'obj': 'Recipe'},
+    'finishers': {'url': 'finishers', 'obj': 'Finisher'},
+    'legends': {'url': 'legends', 'obj': 'Legend'},
+    'dungeons': {'url': 'dungeons', 'obj': 'Dungeon'},
+    'raids': {'url': 'raids', 'obj': 'Raid'},
+    'skills': {'url': 'skills', 'obj': 'Skill'},
+    'items': {'url': 'items', 'obj': 'Item'},
+    'itemstats': {'url': 'itemstats', 'obj': 'ItemStat'},
+    'listings': {'url': 'listings', 'obj': 'TPListing'},
+    'prices': {'url': 'prices', 'obj': 'TPPrice'},
+    'characters': {'url': 'characters', 'obj': 'Character'},
+    'pvpamulets': {'url': 'pvp/amulets', 'obj': 'PVPAmulet'},
+
+    # Guild endpoints.
+    'guildupgrades': {'url': 'guild/upgrades', 'obj': 'GuildUpgrade'},
+
+    'guildpermissions': {
+        'url': 'guild/permissions',
+        'obj': 'GuildPermission'
+    },
+
+    'guilds': {
+        'url': 'guild',
+        'obj': 'Guild'
+    },
+
+    # Achievement Stuff.
+    'achievements': {
+        'url': 'achievements',
+        'obj': 'Achievement'
+    },
+
+    'achievementgroups': {
+        'url': 'achievements/groups',
+        'obj': 'AchievementGroup'
+    },
+
+    'achievementcategorys': {
+        'url': 'achievements/categories',
+        'obj': 'AchievementCategory'
+    },
+}
+
+
+# How long responses from each endpoint may be cached, in seconds.
+# Everything typer knows about is static game data that only
+# changes with a build, so that's the default...
+cacheTTLs = {entry['url']: cache.DAY for entry in crossList.values()}
+
+# ...apart from these. Anything not listed (account/, tokeninfo,
+# pvp/games and so on) isn't cached at all.
+cacheTTLs.update({
+    'characters': 0,
+    'guild': 5 * cache.MINUTE,
+    'build': cache.MINUTE,
+    'worlds': cache.HOUR,
+    'achievements/daily': 5 * cache.MINUTE,
+    'wvw/objectives': cache.DAY,
+    'wvw/matches': 10,
+    'commerce/prices': 30,
+    'commerce/listings': 30,
+    'commerce/exchange': 30,
+})
+
+# The trading post crossList entries are relative to commerce/.
+del cacheTTLs['prices'], cacheTTLs['listings']
+
+# Shared by every client. Set to None to turn caching off, or
+# swap in anything with ResponseCache's get() and put().
+responseCache = cache.ResponseCache(cacheTTLs)
+
+# IDs endpoints have told us don't exist. Set to None to always
+# ask the API.
+badIDs = cache.NegativeCache()
+
+# Off by default, since it needs somewhere to live. Set it to
+# cache.DiskCache('some/dir') to keep static catalogs across
+# restarts.
+diskCache = None
 
 
 class typer(object):
@@ -21,67 +122,14 @@ class typer(object):
         # Convient location for function.
         self.f = f
 
+        # So GlobalAPI.getItem looks like the method; docstring and all.
+        functools.update_wrapper(self, f)
+
         # The string we'll need.
         self.api = self.f.__name__[3:].lower() + 's'
 
-        # This dictionary provides an easy way for me to direct
-        # what kind of data I want from endpoints.
-        self.crossList = {
-            'skins': {'url': 'skins', 'obj': 'Skin'},
-            'dyes': {'url': 'colors', 'obj': 'Dye'},
-            'minis': {'url': 'minis', 'obj': 'Mini'},
-            'bank': {'url': 'items', 'obj': 'Item'},
-            'materials': {'url': 'items', 'obj': 'Material'},
-            'materialcategories': {'url': 'materials', 'obj': 'MaterialCategory'},
-            'professions': {'url': 'professions', 'obj': 'Profession'},
-            'races': {'url': 'races', 'obj': 'Race'},
-            'pets': {'url': 'pets', 'obj': 'Pet'},
-            'masteries': {'url': 'masteries', 'obj': 'Mastery'},
-            'inventory': {'url': 'items', 'obj': 'Item'},
-            'outfits': {'url': 'outfits', 'obj': 'Outfit'},
-            'titles': {'url': 'titles', 'obj': 'Title'},
-            'recipes': {'url': 'recipes', 'obj': 'Recipe'},
-            'finishers': {'url': 'finishers', 'obj': 'Finisher'},
-            'legends': {'url': 'legends', 'obj': 'Legend'},
-            'dungeons': {'url': 'dungeons', 'obj': 'Dungeon'},
-            'raids': {'url': 'raids', 'obj': 'Raid'},
-            'skills': {'url': 'skills', 'obj': 'Skill'},
-            'items': {'url': 'items', 'obj': 'Item'},
-            'itemstats': {'url': 'itemstats', 'obj': 'ItemStat'},
-            'listings': {'url': 'listings', 'obj': 'TPListing'},
-            'prices': {'url': 'prices', 'obj': 'TPPrice'},
-            'characters': {'url': 'characters', 'obj': 'Character'},
-            'pvpamulets': {'url': 'pvp/amulets', 'obj': 'PVPAmulet'},
-
-            # Guild endpoints.
-            'guildupgrades': {'url': 'guild/upgrades', 'obj': 'GuildUpgrade'},
-
-            'guildpermissions': {
-                'url': 'guild/permissions',
-                'obj': 'GuildPermission'
-            },
-
-            'guilds': {
-                'url': 'guild',
-                'obj': 'Guild'
-            },
-
-            # Achievement Stuff.
-            'achievements': {
-                'url': 'achievements',
-                'obj': 'Achievement'
-            },
-
-            'achievementgroups': {
-                'url': 'achievements/groups',
-                'obj': 'AchievementGroup'
-            },
-
-            'achievementcategorys': {
-                'url': 'achievements/categories',
-                'obj': 'AchievementCategory'
-            },
-        }
+        # Shared, module level. See crossList up top.
+        self.crossList = crossList
 
         # The AccountAPI get methods have an s at the end so
         # we need to remove that due to our __init__
@@ -101,40 +149,70 @@ class typer(object):
         # Easy to remember url...
         self.url = self.crossList[self.api]['url']
 
+        # What __get__ binds to instances.
+        self._method = self._wrap()
+
     def __get__(self, instance, className):
         '''
-        This is called immediately before __call__ internally
-        and we need the instance object of the method who called us.
+        This is called when the decorated method is looked up
+        on an object, and we need that object.
+
+        Returns a bound method, cached on the instance so later
+        lookups never come back here. Nothing is stored on the
+        typer itself, so every client (and thread) is safe to
+        call it at the same time.
+        '''
+        if instance is None:
+            return self
+
+        # Looks just like the method it replaced; docstring and all.
+        bound = types.MethodType(self._method, instance)
+        instance.__dict__[self.f.__name__] = bound
+
+        return bound
+
+    def _wrap(self):
+        '''
+        Builds the function that gets bound to instances.
+        Wrapped so it carries the decorated method's name and docs.
+        '''
+        @functools.wraps(self.f)
+        def method(obj, *args, **kwargs):
+            return self(obj, *args, **kwargs)
 
-        This allows us to have that information.
+        return method
 
-        Returns typer.__call__
+    def __call__(self, obj, *args, **kwargs):
         '''
-        self.obj = instance
-        self.className = className
+        'all' and list requests take two optional keywords:
 
-        # "not writable", eh? I bed to differ!
-        # It feels naughty to do this.
-        self.__call__.__func__.__doc__ = self.f.__doc__
+        stream  - If True, return a generator that yields objects
+                  chunk by chunk as the requests finish (in no
+                  particular order) instead of one big list.
+        mapping - If True, return a dictionary of {id: object}
+                  instead of a list.
 
-        # Doesn't work unless you return where to
-        # go next. Naturally, you want calling it to
-        # call __call__
-        return self.__call__
+        'all' also takes:
 
-    def __call__(self, *args):
+        paged   - If True, walk the endpoint 200 objects a page at
+                  a time instead of fetching the ID list first. See
+                  fetchPages.
+
+        Lists come back in the order the IDs were given, with
+        duplicates removed.
+        '''
         # Dirty, but effective...?
-        if 'AccountAPI' in str(self.obj):
-            return self._account()
+        if 'AccountAPI' in str(obj):
+            return self._account(obj)
 
         # HAHAHA TEST COVERAGE IS WHY THIS EXISTS. NUMBERS GAME BAYBEE
-        self.f(self.obj, 'TEST COVERAGE')
+        self.f(obj, 'TEST COVERAGE')
 
         # Do actual things.
-        return typer._worker(*args, self)
+        return typer._worker(*args, self, obj, **kwargs)
 
     @singledispatch
-    def _worker(args, self):
+    def _worker(args, self, obj, **kwargs):
         '''
         The default response if you pass the typer decorator class a function
         which tries to use a paramter it doesn't support.
@@ -142,203 +220,731 @@ class typer(object):
         raise NotImplementedError('@typer does not support {}'.format(type(args)))
 
     @_worker.register(int)
-    def _int(args, self):
+    def _int(args, self, obj, **kwargs):
         '''
         This method runs if the function wrapped by typer receives an
         integer as its requested ID.
         '''
-        jsonData = self.obj.getJson('{}/{}'.format(self.url, args))
-
-        obj = namedtuple(self.crossList[self.api]['obj'], jsonData.keys())
-        return(obj(**jsonData))
+        return self._single(obj, args)
 
     @_worker.register(str)
-    def _str(args, self):
+    def _str(args, self, obj, stream=False, mapping=False, paged=False):
         '''
         This method runs if you pass a typer wrapped function a string.
         '''
+        if args == 'all' and paged:
+            objName = self.crossList[self.api]['obj']
+            executor = threads.getExecutor(obj)
+
+            if stream:
+                return streamPages(obj.getJson, self.url, objName,
+                                   executor=executor)
+
+            return fetchPages(obj.getJson, self.url, objName,
+                              executor=executor, mapping=mapping)
+
         # This is now much faster. Safe to use, though still can be ~30s
-        if args == 'all':
+        elif args == 'all':
             # Default case: get all of them.
-            ids = self.obj.getJson(self.url)
+            ids = obj.getJson(self.url)
+
+            # Don't hold the whole catalog in memory if they don't want it.
+            if stream:
+                return self._stream(obj, ids)
 
             # Reusable function.
-            return self._chunk_and_thread(ids)
+            return self._chunk_and_thread(obj, ids, mapping=mapping)
 
         else:
-            jsonData = self.obj.getJson('{}/{}'.format(self.url, args))
-
-            obj = namedtuple(self.crossList[self.api]['obj'], jsonData.keys())
-            return(obj(**jsonData))
+            return self._single(obj, args)
 
     @_worker.register(list)
-    def _list(args, self):
+    def _list(args, self, obj, stream=False, mapping=False):
         '''
         This runs if you pass a typer wrapped function a list.
         '''
-        # Going to need this.
-        objects = []
+        if stream:
+            return self._stream(obj, args)
 
-        # Build clean string to append to URL.
-        cleanList = ','.join(str(x) for x in args)
+        # Chunked and threaded, so any number of IDs is fine.
+        return self._chunk_and_thread(obj, args, mapping=mapping)
 
-        # Build our string.
-        cleanURL = '{}?ids={}'.format(self.url, cleanList)
+    def _single(self, obj, itemID):
+        '''
+        Fetch one object by ID, or queue it if the client has a
+        batch open (see gw2apiwrapper.batching) and return a Future.
+        '''
+        objName = self.crossList[self.api]['obj']
 
-        # Get the JSON.
-        data = self.obj.getJson(cleanURL)
+        batch = batching.current(obj)
+        if batch is not None:
+            return batch.add(self.url, objName, itemID)
 
-        # Generate the objects.
-        for item in data:
-            # Define a namedtuple for use as object.
-            # I'm not sure how good of a practice it is to
-            # create the namedtuple in here. Likely to change.
-            obj = namedtuple(self.crossList[self.api]['obj'], item.keys())
-            objects.append(obj(**item))
+        scope = authScope(obj)
+        if badIDs is not None and badIDs.known(self.url, itemID, scope):
+            raise ValueError('Known bad ID: {} | URL: {}'.format(itemID,
+                                                                 self.url))
 
-        # Return said objects.
-        return(objects)
+        try:
+            jsonData = obj.getJson('{}/{}'.format(self.url, itemID))
+        except ValueError:
+            # 404; don't ask again for a while.
+            if badIDs is not None:
+                badIDs.add(self.url, [itemID], scope)
+            raise
+
+        return(records.build(objName, jsonData))
 
-    def _account(self):
+    def _account(self, obj):
         '''
         We do pretty specific processing for AccountAPI objects, so we
         separate that here. This method handles all authentication
         required typer wrapped functions.
         '''
         # We do this to check for permissions!
-        self.f(self.obj)
-
-        # For returning later.
-        objects = []
+        self.f(obj)
 
         # This is hackery.
         if self.api != 'characters':
-            data = self.obj.getJson('account/{}'.format(self.api))
+            data = obj.getJson('account/{}'.format(self.api))
         else:
-            data = self.obj.getJson(self.api)
+            data = obj.getJson(self.api)
+
+        # This whole method makes me laugh.
+        objName = self.crossList[self.api]['obj']
 
-        # I am both proud of an ashamed of this line.
-        # I split the skinIDs into 200 element chunks.
-        # The API only supports 200 IDs at once.
-        # Personally I blame terrorism.
-        safeList = [data[x:x + 200] for x in range(0, len(data), 200)]
+        # Same chunked, threaded fetching as everything else. Each
+        # unique ID is only requested once, no matter how many
+        # stacks of it are in the bank.
+        def fetch(ids, mapping=False):
+            return fetchChunks(obj.getJson, self.url, ids, objName,
+                               executor=threads.getExecutor(obj),
+                               mapping=mapping, scope=authScope(obj))
 
         # This feels wrong, I may address it later if
         # it begins to cause problems.
         if any(isinstance(x, dict) for x in data):
-            dictFlag = True
+            # getBank can return None.
+            built = fetch([part['id'] for part in data if part],
+                          mapping=True)
+
+            objects = attachObjects(data, built)
+
         else:
-            dictFlag = False
+            objects = fetch(data)
 
-        # NOTE: I should somehow make this use _chunk_and_thread
-        # The processing of the IDs.
-        for safe in safeList:
-            if dictFlag:
-                # Try to turn the dictionary IDs to a string
-                temp = [current['id'] for current in safe if current]
+        # We need to assign the data to the object.
+        setattr(obj, self.api, objects)
 
-                # Self documenting?
-                cleanStr = ','.join(str(x) for x in temp)
+        # Return it for immediate use as interator.
+        # If that's what gets you hard.
+        return(objects)
 
-            else:
-                # If it's not a dictionary, do this
-                cleanStr = ','.join(str(x) for x in safe)
+    def _chunk_and_thread(self, obj, biglist, mapping=False):
+        return fetchChunks(obj.getJson, self.url, biglist,
+                           self.crossList[self.api]['obj'],
+                           executor=threads.getExecutor(obj),
+                           mapping=mapping, scope=authScope(obj))
 
-            # Build a pretty URL.
-            cleanURL = '{}?ids={}'.format(self.url, cleanStr)
+    def _stream(self, obj, biglist, window=None):
+        '''
+        Fetch biglist on the client's executor. See streamChunks.
+        '''
+        return streamChunks(obj.getJson, self.url, biglist,
+                            self.crossList[self.api]['obj'],
+                            executor=threads.getExecutor(obj),
+                            window=window, scope=authScope(obj))
 
-            # Lets build some objects!
-            for item in self.obj.getJson(cleanURL):
-                # This whole for loop makes me laugh.
-                objName = self.crossList[self.api]['obj']
 
-                obj = namedtuple(objName, item.keys())
+def streamChunks(caller, url, ids, name, executor=None, window=None,
+                 scope=''):
+    '''
+    Fetch ids from url in 200 ID chunks (the API's limit) on the
+    executor and return a generator yielding 'name' objects as
+    each chunk finishes.
 
-                # Handle dictionaries differently.
-                if dictFlag:
-                    # Add our item object to the dictionary
-                    for part in data:
-                        # getBank can return None.
-                        if part and item['id'] == part['id']:
-                            part.update({'object': obj(**item)})
+    caller is the getJson to use, usually a client's.
 
-                            # List of dictionaries recreated!
-                            objects.append(part)
-                else:
-                    objects.append(obj(**item))
+    Duplicate IDs are only requested once and only show up once.
+    IDs the API doesn't know are skipped rather than failing the
+    whole thing. See fetchChunk, which scope is passed on to.
 
-        # We need to assign the data to the object.
-        setattr(self.obj, self.api, objects)
+    At most 'window' chunks (default: the executor's worker count)
+    are requested ahead of the consumer, so a slow consumer
+    slows the requests down instead of piling up results.
+    '''
+    if executor is None:
+        executor = threads.shared
 
-        # Return it for immediate use as interator.
-        # If that's what gets you hard.
-        return(objects)
+    if window is None:
+        window = executor.max_workers
 
-    def _chunk_and_thread(self, biglist, dictFlag=False):
-        objects = []
+    # The API treats 35 and '35' the same, so we do too.
+    ids = list(dict.fromkeys(str(x) for x in ids))
 
-        # Useful line is useful.
-        safeList = [biglist[x:x + 200] for x in range(0, len(biglist), 200)]
+    # Useful line is useful.
+    safeList = [ids[x:x + 200] for x in range(0, len(ids), 200)]
 
-        with cc.ThreadPoolExecutor(max_workers=len(safeList)) as executor:
-            caller = self.obj.getJson
-            tasks = {}
+    def generate():
+        pending = set()
 
-            # for each item of the safeList spawn a thread to grab the IDs
-            # and bulid the objects, then combine
+        try:
+            # for each item of the safeList submit a task to grab
+            # the IDs, then build the objects as they come back.
             for safe in safeList:
-                cleanStr = ','.join(str(x) for x in safe)
-                cleanURL = '{}?ids={}'.format(self.url, cleanStr)
-                tasks.update({executor.submit(caller, cleanURL): safe})
+                pending.add(executor.submit(fetchChunk, caller, url, safe,
+                                            scope))
 
-            for future in cc.as_completed(tasks):
+                if len(pending) < window:
+                    continue
+
+                done, pending = cc.wait(
+                    pending, return_when=cc.FIRST_COMPLETED
+                )
+                for future in done:
+                    for thing in future.result():
+                        yield records.build(name, thing)
+
+            for future in cc.as_completed(pending):
                 for thing in future.result():
-                    # PEP8
-                    name = self.crossList[self.api]['obj']
+                    yield records.build(name, thing)
+
+        finally:
+            # Consumer walked away early. Don't bother with the rest.
+            for future in pending:
+                future.cancel()
+
+    return generate()
+
+
+def authScope(obj):
+    '''
+    The auth scope (see transport.requestKey) of a client's
+    requests; '' for clients without an API key.
+    '''
+    return transport.requestKey('', getattr(obj, 'header', None))[0]
+
+
+def fetchChunk(caller, url, ids, scope=''):
+    '''
+    Fetch one chunk of ids (200 or fewer) from url with ?ids=,
+    getting around bad IDs instead of failing on them.
+
+    IDs in badIDs are left out of the request. The API answers
+    206 with fewer results when some IDs are bad, and a 404
+    saying so when they all are; either way, the missing ones
+    are added to badIDs under the auth scope (see authScope)
+    the caller's requests are made with. Any other 404 raises.
+
+    If the API rejects the request with a 400 blaming the IDs,
+    the chunk is split in half and each half retried, down to
+    the single IDs at fault. Those are left out, but not added
+    to badIDs. Any other failure raises, as getJson would.
+
+    caller has to take meta=True. Returns a list of the JSON
+    objects that came back.
+    '''
+    ids = [str(x) for x in ids]
+    if badIDs is not None:
+        ids = [x for x in ids if not badIDs.known(url, x, scope)]
+
+    if not ids:
+        return []
+
+    response = caller(idsURL(url, ids), meta=True)
+    if response.status == 404 and blamesIDs(response):
+        # None of them exist.
+        noteMissing(url, ids, [], scope)
+        return []
+
+    if checkChunk(response):
+        if len(ids) == 1:
+            return []
+
+        half = len(ids) // 2
+        return (fetchChunk(caller, url, ids[:half], scope) +
+                fetchChunk(caller, url, ids[half:], scope))
 
-                    # Build the definition of the data and add to list.
-                    obj = namedtuple(name, thing.keys())
-                    objects.append(obj(**thing))
+    noteMissing(url, ids, response.data, scope)
+    return response.data
 
-        return objects
 
+def checkChunk(response):
+    '''
+    Look over the ApiResponse for a chunk of IDs.
+
+    Returns True if the API rejected the chunk because of the
+    IDs in it, so it's worth splitting, or False if it's fine.
+    Raises what getJson would for anything else.
+    '''
+    if response.ok:
+        return False
+
+    # eg. a malformed ID. Not eg. 'invalid lang'.
+    if response.status == 400 and blamesIDs(response):
+        return True
+
+    response.check()
+
+
+def blamesIDs(response):
+    '''
+    True if an unsuccessful ApiResponse's error text is about the
+    IDs asked for (eg. 'all ids provided are invalid'), rather
+    than eg. the endpoint or a parameter.
+    '''
+    return bool(re.search(r'\bids?\b', (response.error or '').lower()))
 
 
-def getJson(url, header=None):
+def idsURL(url, ids):
+    '''
+    url with ?ids= for the given ID strings, each quoted on its
+    own; character names have spaces and who knows what else.
+    '''
+    return '{}?ids={}'.format(
+        url, ','.join(urllib.parse.quote(x, safe='') for x in ids)
+    )
+
+
+def noteMissing(url, ids, data, scope=''):
+    '''
+    Add the ids that didn't come back in data to badIDs.
+    '''
+    if badIDs is None:
+        return
+
+    try:
+        found = {str(thing['id']) for thing in data}
+    except (KeyError, TypeError):
+        # Nothing to match them up by.
+        return
+
+    badIDs.add(url, [x for x in ids if x not in found], scope)
+
+
+def _pages(caller, url, executor=None, window=None, size=200):
+    '''
+    Yields (page number, JSON) for every page of url, in the
+    order they finish. The first page says how many there are.
+    '''
+    if executor is None:
+        executor = threads.shared
+
+    if window is None:
+        window = executor.max_workers
+
+    joiner = '&' if '?' in url else '?'
+    pageURL = url + joiner + 'page={}&page_size=' + str(size)
+
+    # Straight from the API: the disk cache doesn't keep headers,
+    # and without X-Page-Total we'd stop after the first page.
+    first = caller(pageURL.format(0), meta=True, fresh=True).check()
+
+    pages = first.pageTotal
+    if pages is None:
+        if len(first.data) >= size:
+            raise ValueError('No X-Page-Total to page through | '
+                             'URL: {}'.format(first.url))
+        pages = 1
+
+    yield 0, first.data
+
+    pending = set()
+    numbers = {}
+
+    try:
+        for page in range(1, pages):
+            future = executor.submit(caller, pageURL.format(page))
+            numbers[future] = page
+            pending.add(future)
+
+            if len(pending) < window:
+                continue
+
+            done, pending = cc.wait(pending, return_when=cc.FIRST_COMPLETED)
+            for future in done:
+                yield numbers.pop(future), future.result()
+
+        for future in cc.as_completed(pending):
+            yield numbers.pop(future), future.result()
+
+    finally:
+        # Consumer walked away early. Don't bother with the rest.
+        for future in pending:
+            future.cancel()
+
+
+def streamPages(caller, url, name, executor=None, window=None):
+    '''
+    Fetch every object at url with ?page=N&page_size=200 requests
+    and return a generator yielding 'name' objects as each page
+    finishes.
+
+    Unlike streamChunks, there's no list of IDs to fetch first:
+    the first page's X-Page-Total header says how many more pages
+    to ask for, and those are requested concurrently, at most
+    'window' ahead of the consumer.
+
+    caller is the getJson to use, usually a client's. It has to
+    take meta and fresh.
+    '''
+    def generate():
+        for page, data in _pages(caller, url, executor, window):
+            for thing in data:
+                yield records.build(name, thing)
+
+    return generate()
+
+
+def fetchPages(caller, url, name, executor=None, mapping=False):
+    '''
+    Same as streamPages, but waits for everything and returns a
+    list in the API's order (or a dictionary of {id: object} if
+    mapping is True).
+    '''
+    pages = dict(_pages(caller, url, executor, window=float('inf')))
+    objects = [records.build(name, thing)
+               for page in sorted(pages) for thing in pages[page]]
+
+    if mapping:
+        return {obj.id: obj for obj in objects}
+
+    return objects
+
+
+def attachObjects(data, built):
+    '''
+    Add each account entry's object (from the {id: object}
+    dictionary built) to the entry under 'object', in one pass.
+
+    Returns the entries that got one.
+    '''
+    objects = []
+    for part in data:
+        # getBank can return None.
+        if part and part['id'] in built:
+            part.update({'object': built[part['id']]})
+
+            # List of dictionaries recreated!
+            objects.append(part)
+
+    return objects
+
+
+def fetchChunks(caller, url, ids, name, executor=None, mapping=False,
+                scope=''):
+    '''
+    Same as streamChunks, but waits for everything and returns
+    a list in the same order as ids. Duplicate IDs are only
+    requested once and only show up once.
+
+    If mapping is True, returns a dictionary of {id: object}
+    instead, still in the order of ids.
+
+    Either way, the result's 'missing' attribute lists the IDs
+    the API didn't return. See BulkList.
+    '''
+    # The API treats 35 and '35' the same, so we do too.
+    unique = list(dict.fromkeys(str(x) for x in ids))
+
+    # No window; the executor already bounds what's in flight.
+    objects = list(streamChunks(caller, url, unique, name,
+                                executor=executor, window=len(unique),
+                                scope=scope))
+
+    return orderResults(objects, unique, name, mapping)
+
+
+class BulkList(list):
+    '''
+    The objects from a bulk request, plus 'missing': a list of the
+    requested IDs the API didn't return, in the order asked for.
+    '''
+    missing = ()
+
+
+class BulkDict(dict):
+    '''
+    BulkList, as a dictionary of {id: object}.
+    '''
+    missing = ()
+
+
+def orderResults(objects, ids, name, mapping=False):
+    '''
+    Put bulk results back in the order of ids (a list of unique
+    ID strings). See fetchChunks.
+
+    Returns a BulkList, or a BulkDict if mapping is True.
+    '''
+    # Index the results once to put them back in order.
+    try:
+        byID = {str(obj.id): obj for obj in objects}
+    except AttributeError:
+        # Nothing to sort by. Completion order it is.
+        byID = None
+
+    if byID is None:
+        if mapping:
+            raise ValueError('{} objects have no id'.format(name))
+
+        return BulkList(objects)
+
+    # IDs the API didn't return are left out, and listed instead.
+    if mapping:
+        results = BulkDict((byID[x].id, byID[x]) for x in ids if x in byID)
+    else:
+        results = BulkList(byID[x] for x in ids if x in byID)
+
+    # Numeric IDs go back to being numbers.
+    results.missing = [int(x) if x.isdigit() else x
+                       for x in ids if x not in byID]
+
+    return results
+
+
+class ApiResponse:
+    '''
+    Decoded JSON along with everything else the API sent back.
+    What getJson returns when asked for meta=True.
+
+    data    - The decoded JSON, as getJson would normally return.
+              None if the request was unsuccessful.
+    status  - (int) HTTP status code. 206 means some IDs were bad.
+    reason  - (str) HTTP reason phrase.
+    headers - (HTTPMessage) Response headers. Empty for responses
+              served from the disk cache.
+    url     - (str) The URL requested.
+    elapsed - (float) Seconds it took, cache lookups included.
+    size    - (int) Size of the raw body, in bytes.
+    cached  - (bool) Whether it was served from a cache.
+    error   - (str) The API's explanation for an unsuccessful
+              response, or None.
+    '''
+    __slots__ = ('data', 'status', 'reason', 'headers', 'url', 'elapsed',
+                 'size', 'cached', 'error')
+
+    def __init__(self, response, url, elapsed, cached=False):
+        self.status = response.status
+        self.reason = response.reason
+        self.headers = response.headers
+        self.url = url
+        self.elapsed = elapsed
+        self.size = len(response.body)
+        self.cached = cached
+
+        if self.ok:
+            self.data = decode(response, url)
+            self.error = None
+        else:
+            self.data = None
+            self.error = errorText(response)
+
+    def __repr__(self):
+        return '<ApiResponse {} {} bytes {}>'.format(
+            self.status, self.size, self.url
+        )
+
+    @property
+    def ok(self):
+        '''
+        True for a 2xx response.
+        '''
+        return 200 <= self.status < 300
+
+    def check(self):
+        '''
+        Raise what getJson would have for an unsuccessful response.
+        Returns itself otherwise, for chaining.
+        '''
+        if not self.ok:
+            raiseFor(self.status, self.reason, self.url, self.error)
+
+        return self
+
+    def _int(self, name):
+        try:
+            return int(self.headers.get(name))
+        except (TypeError, ValueError):
+            return None
+
+    @property
+    def pageTotal(self):
+        '''
+        Number of pages (X-Page-Total), or None.
+        '''
+        return self._int('X-Page-Total')
+
+    @property
+    def pageSize(self):
+        '''
+        Results per page (X-Page-Size), or None.
+        '''
+        return self._int('X-Page-Size')
+
+    @property
+    def resultTotal(self):
+        '''
+        Results the endpoint has in total (X-Result-Total), or None.
+        '''
+        return self._int('X-Result-Total')
+
+    @property
+    def resultCount(self):
+        '''
+        Results in this response (X-Result-Count), or None.
+        '''
+        return self._int('X-Result-Count')
+
+    @property
+    def maxAge(self):
+        '''
+        Seconds the server says this may be cached for, from
+        Cache-Control, or None.
+        '''
+        for part in (self.headers.get('Cache-Control') or '').split(','):
+            name, _, value = part.strip().partition('=')
+            if name.lower() == 'max-age' and value.isdigit():
+                return int(value)
+
+        return None
+
+    @property
+    def language(self):
+        '''
+        Language of the response (Content-Language), or None.
+        '''
+        return self.headers.get('Content-Language')
+
+    @property
+    def partial(self):
+        '''
+        True if only some of the requested IDs came back.
+        '''
+        return self.status == 206
+
+
+def getJson(url, header=None, meta=False, fresh=False):
     '''
     Got tired of writing this over and over.
     What functions are for, right?
+
+    Requests go out through gw2apiwrapper.transport, which pools
+    connections, rate limits and retries for us. Responses are
+    cached in responseCache according to cacheTTLs, and in
+    diskCache if it's been set.
+
+    If meta is True, returns an ApiResponse (status, headers,
+    timing and so on) with the JSON as its data, instead of
+    just the JSON. Unsuccessful responses are returned too,
+    instead of raised, so the status can be looked at; see
+    ApiResponse.check.
+
+    If fresh is True, the caches are skipped and the API asked
+    directly. The answer still refreshes the caches.
     '''
     if ' ' in url:
-        url = urllib.parse.quote(url, safe='/:')
+        # Leave the query's structure (and anything quoted) alone.
+        url = urllib.parse.quote(url, safe='/:?=&,%')
+
+    start = time.monotonic()
+
+    # Static data is served from the caches when we can.
+    response = None if fresh else cached(url, header)
+    hit = response is not None
+
+    if not hit:
+        response = transport.fetch(url, header)
+        store(url, header, response)
+
+    if not meta:
+        return(decode(response, url))
+
+    return ApiResponse(response, url, time.monotonic() - start, hit)
+
+
+def cached(url, header=None):
+    '''
+    Look for a response in responseCache, then diskCache.
+
+    Returns a Response or None.
+    '''
+    if diskCache is not None and diskCache.cacheable(url, header):
+        # Notice a new build (which empties responseCache) before
+        # trusting anything we have for it.
+        diskCache.build()
+
+    if responseCache is not None:
+        response = responseCache.get(url, header)
+        if response is not None:
+            return response
+
+    if diskCache is not None:
+        response = diskCache.get(url, header)
+
+        # Keep it handy in memory too.
+        if response is not None and responseCache is not None:
+            responseCache.put(url, header, response)
+
+        return response
+
+
+def store(url, header, response):
+    '''
+    Offer a fresh response to both caches.
+    '''
+    if responseCache is not None:
+        responseCache.put(url, header, response)
+
+    if diskCache is not None:
+        diskCache.put(url, header, response)
+
+
+def decode(response, url):
+    '''
+    Turn a transport Response into JSON, or the exception
+    getJson is expected to raise.
+    '''
+    if 200 <= response.status < 300:
+        return(json.loads(response.body.decode('UTF-8')))
+
+    raiseFor(response.status, response.reason, url, errorText(response))
 
+
+def errorText(response):
+    '''
+    The API's explanation for an unsuccessful Response (its
+    {'text': ...} body), or None.
+    '''
     try:
-        if header is not None:
-            request = urllib.request.Request(url, None, header)
-            with urllib.request.urlopen(request) as response:
-                jsonData = json.loads(response.read().decode('UTF-8'))
-                return(jsonData)
-        else:
-            # This one doesn't need a header.
-            with urllib.request.urlopen(url) as response:
-                return(json.loads(response.read().decode('UTF-8')))
-    except urllib.error.HTTPError as e:
-        if e.code == 404:
-            # 404 NOT FOUND is useful, but it helps to point them
-            # in the right direction.
-            error = 'Likely bad ID: {} {} | URL: {}'.format(
-                e.code, e.msg, url
-            )
+        return json.loads(response.body.decode('UTF-8'))['text']
+    except (ValueError, KeyError, TypeError):
+        return None
 
-            # Dangerous magic!
-            raise ValueError(error) from None
 
-        elif e.code == 403:
-            # 403: Forbidden is invalid authentication.
-            error = 'Likely bad APIKEY: {} {}'.format(e.code, e.msg)
+def raiseFor(status, reason, url, error=None):
+    '''
+    Raise the exception getJson raises for an unsuccessful status.
+    '''
+    if status == 404:
+        # 404 NOT FOUND is useful, but it helps to point them
+        # in the right direction.
+        error = 'Likely bad ID: {} {} | URL: {}'.format(status, reason, url)
+
+        # Dangerous magic!
+        raise ValueError(error) from None
+
+    elif status in (401, 403):
+        # 401/403 are invalid (or underpowered) authentication.
+        error = 'Likely bad APIKEY: {} {}'.format(status, reason)
 
-            # MORE DANGEROUS MAGIC
-            raise PermissionError(error) from None
+        # MORE DANGEROUS MAGIC
+        raise PermissionError(error) from None
+
+    # Anything else is a request the API won't answer. Not None.
+    raise ConnectionError('API error: {} {} ({}) | URL: {}'.format(
+        status, reason, error, url
+    )) from None
 
 
 def getBuild():
@@ -409,15 +1015,21 @@ def isMaterial(itemID):
         return(set(matIDs).intersection(itemID))
 
 
-def recipeSearch(in_or_out, itemID):
+def recipeSearch(in_or_out, itemID, graph=None):
     '''
     Search using the 'recipe/search' API for the given
     ID. Depending on your parameters, it will either
     return the recipes that produce (output) or take
     (input) the item ID.
 
+    Pass a recipes.RecipeGraph as graph to answer it locally
+    instead of asking the API.
+
     Returns a list containing the revelent IDs.
     '''
+    if graph is not None:
+        return graph.search(in_or_out, itemID)
+
     # I just want it on record that I don't like this method.
     # It's ugly and it stinks....PEP8 doe..
 
@@ -1,16 +1,37 @@
-from collections import namedtuple
-from .functions import getJson, typer
+import functools
+from . import batching, records, threads
+from .functions import crossList, fetchChunks, fetchPages, getJson, typer
 
 
 class GlobalAPI:
-    def __init__(self):
+    def __init__(self, executor=None):
+        '''
+        Takes an optional executor (see gw2apiwrapper.threads) used for
+        the concurrent bulk requests. Defaults to the shared one.
+        '''
         self.url = 'https://api.guildwars2.com/v2/'
+        self.executor = executor
 
-    def getJson(self, api):
+        # Where syncCatalog's refresh sample left off, per endpoint.
+        self._syncOffsets = {}
+
+    def getJson(self, api, meta=False, fresh=False):
         '''
         Simple wrapper for less typing.
         '''
-        return(getJson(self.url + api, header=None))
+        return(getJson(self.url + api, header=None, meta=meta, fresh=fresh))
+
+    def batch(self, window=None):
+        '''
+        Returns a context manager inside which single ID lookups
+        (eg. getItem(12452)) return Futures and are sent together
+        as bulk requests. See gw2apiwrapper.batching.Batch.
+
+        window - (float) Also send whatever's waiting this many
+                 seconds after the first lookup, instead of only
+                 at 200 IDs or the end of the block.
+        '''
+        return batching.Batch(self, window=window)
 
     @typer
     def getPVPAmulets(self, id_or_list):
@@ -263,37 +284,26 @@ class GlobalAPI:
         '''
         pass
 
-    def getWVWObjective(self, wvwID, objects=None):
+    def getWVWObjective(self, wvwID, objects=None, paged=False):
         '''
         Query the Guild Wars 2 wvw/objectives API and build
         object(s) based off the returned JSON.
 
         Accepts lists, strings, and WVWMaps.
 
+        With paged=True, 'all' is fetched a page at a time
+        (see functions.fetchPages) instead of in one request.
+
         https://wiki.guildwars2.com/wiki/API:2/wvw/objectives#Response
         '''
         if type(wvwID) is list:
             if objects is None:
                 objects = []
 
-            # Build clean string to append to URL.
-            cleanList = ','.join(str(x) for x in wvwID)
-
-            # Build the URL.
-            cleanURL = 'wvw/objectives?ids={}'.format(cleanList)
-
-            data = self.getJson(cleanURL)
-            obj = namedtuple('WVWObjective', data[0].keys())
-
-            # Generate the objects.
-            for name in data:
-                try:
-                    objects.append(obj(**name))
-                except TypeError:
-                    # Not all WVW Objectives are created equal..
-                    # ArenaNet, please be consistent..please.
-                    specialObj = namedtuple('WVWObjective', name.keys())
-                    objects.append(specialObj(**name))
+            # Chunked by 200 and fetched concurrently.
+            objects.extend(fetchChunks(self.getJson, 'wvw/objectives', wvwID,
+                                       'WVWObjective',
+                                       executor=threads.getExecutor(self)))
 
             # Return said objects.
             return(objects)
@@ -303,30 +313,28 @@ class GlobalAPI:
                 if objects is None:
                     objects = []
 
+                if paged:
+                    objects.extend(fetchPages(
+                        self.getJson, 'wvw/objectives', 'WVWObjective',
+                        executor=threads.getExecutor(self)
+                    ))
+                    return(objects)
+
                 # Default case: get all of them.
                 wvwJSON = self.getJson('wvw/objectives?ids=all')
-                obj = namedtuple('WVWObjective', wvwJSON[0].keys())
 
                 # Generate objects.
                 for item in wvwJSON:
-                    # As is expected from the GW2 official API
-                    # there is inconsistency and no default values
-                    # for their returned JSON. So we must do this..
-                    try:
-                        objects.append(obj(**item))
-                    except TypeError:
-                        temp_obj = namedtuple('WVWObjective', item.keys())
-                        objects.append(temp_obj(**item))
+                    objects.append(records.build('WVWObjective', item))
 
                 # Return them all.
                 return(objects)
 
             else:
                 jsonData = self.getJson('wvw/objectives/{}'.format(wvwID))
-                obj = namedtuple('WVWObjective', jsonData.keys())
 
                 # Return the Object.
-                return(obj(**jsonData))
+                return(records.build('WVWObjective', jsonData))
 
     def getWVWMatches(self, matchID, objects=None):
         '''
@@ -339,18 +347,10 @@ class GlobalAPI:
             if objects is None:
                 objects = []
 
-            # Build clean string to append to URL.
-            cleanList = ','.join(str(x) for x in matchID)
-
-            # Build the URL.
-            cleanURL = 'wvw/matches?ids={}'.format(cleanList)
-
-            data = self.getJson(cleanURL)
-            obj = namedtuple('WVWMatch', data[0].keys())
-
-            # Generate the objects.
-            for name in data:
-                objects.append(obj(**name))
+            # Chunked by 200 and fetched concurrently.
+            objects.extend(fetchChunks(self.getJson, 'wvw/matches', matchID,
+                                       'WVWMatch',
+                                       executor=threads.getExecutor(self)))
 
             # Return said objects.
             return(objects)
@@ -362,21 +362,19 @@ class GlobalAPI:
 
                 # Default case: get all of them.
                 wvwJSON = self.getJson('wvw/matches?ids=all')
-                obj = namedtuple('WVWMatch', wvwJSON[0].keys())
 
                 # Generate objects.
                 for item in wvwJSON:
-                    objects.append(obj(**item))
+                    objects.append(records.build('WVWMatch', item))
 
                 # Return them all.
                 return(objects)
 
             else:
                 jsonData = self.getJson('wvw/matches/{}'.format(matchID))
-                obj = namedtuple('WVWMatch', jsonData.keys())
 
                 # Return the Object.
-                return(obj(**jsonData))
+                return(records.build('WVWMatch', jsonData))
 
     def getDailies(self, tomorrow=False):
         '''
@@ -393,3 +391,58 @@ class GlobalAPI:
         idList = [data['id'] for value in jsonData.values() for data in value]
 
         return(self.getAchievement(idList))
+
+    def syncCatalog(self, endpoint, store, sample=0, prune=False):
+        '''
+        Bring a local mirror of an endpoint up to date, fetching
+        only what it doesn't have yet.
+
+        endpoint - (str) The typer name of the endpoint, eg. 'items',
+                   'skins' or 'recipes'.
+        store    - (dict) Any mutable mapping of ID -> object. Only
+                   its keys are read; new objects are written in.
+        sample   - (int) Also re-fetch this many IDs we already have,
+                   to pick up changes. Each call carries on from
+                   where the last one left off, so repeated syncs
+                   work through the whole catalog.
+        prune    - (bool) Remove IDs the API no longer lists.
+
+        Returns a dictionary with the counts for 'added',
+        'refreshed' and 'removed'.
+        '''
+        entry = crossList[endpoint]
+
+        # The cheap part: just the IDs. Straight from the API, since
+        # the cached list can be a day old.
+        ids = self.getJson(entry['url'], fresh=True)
+        have = set(store.keys())
+
+        new = [x for x in ids if x not in have]
+        existing = [x for x in ids if x in have]
+
+        refresh = []
+        if sample and existing:
+            start = self._syncOffsets.get(endpoint, 0) % len(existing)
+            refresh = (existing[start:] + existing[:start])[:sample]
+
+            start = (start + len(refresh)) % len(existing)
+            self._syncOffsets[endpoint] = start
+
+        if new or refresh:
+            # Refreshing from the cache wouldn't refresh much.
+            caller = functools.partial(self.getJson, fresh=True)
+            store.update(fetchChunks(caller, entry['url'],
+                                     new + refresh, entry['obj'],
+                                     executor=threads.getExecutor(self),
+                                     mapping=True))
+
+        removed = []
+        if prune:
+            current = set(ids)
+            removed = [x for x in have if x not in current]
+
+            for x in removed:
+                del store[x]
+
+        return {'added': len(new), 'refreshed': len(refresh),
+                'removed': len(removed)}
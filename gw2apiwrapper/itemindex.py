@@ -0,0 +1,212 @@
+import re
+import bisect
+from collections import defaultdict
+
+
+def _tokens(name):
+    '''
+    Split a name into lowercase words.
+    '''
+    return set(re.findall(r'\w+', (name or '').lower()))
+
+
+def _grams(text):
+    '''
+    Every three character slice of the text.
+    '''
+    return {text[x:x + 3] for x in range(len(text) - 2)}
+
+
+class ItemIndex:
+    '''
+    A local, indexed store of Item objects (as returned by
+    GlobalAPI.getItem or kept by syncCatalog) for fast lookups
+    without scanning lists or hitting the API.
+
+    Secondary indexes are kept on type, rarity, level, flags
+    and game_types, plus a word index on names for prefix search
+    and a three character index for substring search.
+
+    eg.
+        index = ItemIndex(api.getItem('all'))
+        index.query(type='Trinket', rarity='Ascended', level=80,
+                    name='mist')
+    '''
+    def __init__(self, items=()):
+        # id -> Item
+        self.items = {}
+
+        # value -> set of IDs, per attribute.
+        self._indexes = {
+            'type': defaultdict(set),
+            'rarity': defaultdict(set),
+            'level': defaultdict(set),
+            'flags': defaultdict(set),
+            'game_types': defaultdict(set),
+        }
+
+        # Name word -> IDs, and three character slice -> IDs.
+        self._words = defaultdict(set)
+        self._grams = defaultdict(set)
+
+        # Sorted list of words, rebuilt lazily for prefix search.
+        self._sortedWords = None
+
+        for item in items:
+            self.add(item)
+
+    def __len__(self):
+        return len(self.items)
+
+    def __contains__(self, itemID):
+        return itemID in self.items
+
+    def __getitem__(self, itemID):
+        return self.items[itemID]
+
+    def _keys(self, item):
+        '''
+        Every (index, value) pair an item belongs under.
+        '''
+        for attr in ('type', 'rarity', 'level'):
+            yield attr, getattr(item, attr, None)
+
+        for attr in ('flags', 'game_types'):
+            for value in getattr(item, attr, None) or ():
+                yield attr, value
+
+    def add(self, item):
+        '''
+        Add an Item, replacing any with the same ID.
+        '''
+        if item.id in self.items:
+            self.remove(item.id)
+
+        self.items[item.id] = item
+
+        for attr, value in self._keys(item):
+            self._indexes[attr][value].add(item.id)
+
+        name = (item.name or '').lower()
+        for word in _tokens(name):
+            self._words[word].add(item.id)
+        for gram in _grams(name):
+            self._grams[gram].add(item.id)
+
+        self._sortedWords = None
+
+    def remove(self, itemID):
+        '''
+        Remove an Item by ID.
+        '''
+        item = self.items.pop(itemID)
+
+        for attr, value in self._keys(item):
+            self._indexes[attr][value].discard(itemID)
+
+        name = (item.name or '').lower()
+        for word in _tokens(name):
+            self._words[word].discard(itemID)
+        for gram in _grams(name):
+            self._grams[gram].discard(itemID)
+
+        self._sortedWords = None
+
+    def _prefix(self, prefix):
+        '''
+        IDs of items with a word in their name starting with prefix.
+        '''
+        if self._sortedWords is None:
+            self._sortedWords = sorted(w for w, ids in self._words.items()
+                                       if ids)
+
+        prefix = prefix.lower()
+        start = bisect.bisect_left(self._sortedWords, prefix)
+
+        found = set()
+        for word in self._sortedWords[start:]:
+            if not word.startswith(prefix):
+                break
+            found |= self._words[word]
+
+        return found
+
+    def _substring(self, text):
+        '''
+        IDs of items whose name contains text.
+        '''
+        text = text.lower()
+        grams = _grams(text)
+
+        # Narrow it down with the slices, then check for real.
+        if grams:
+            candidates = set.intersection(*(self._grams.get(g, set())
+                                            for g in grams))
+        else:
+            candidates = self.items.keys()
+
+        return {x for x in candidates
+                if text in (self.items[x].name or '').lower()}
+
+    def query(self, type=None, rarity=None, level=None, flags=None,
+              game_types=None, name=None, prefix=None):
+        '''
+        Find items matching every given filter.
+
+        type       - (str) eg. 'Trinket'.
+        rarity     - (str) eg. 'Ascended'.
+        level      - (int) An exact level, or a (min, max) tuple.
+        flags      - (list) Flags the item must all have.
+        game_types - (list) Game types the item must all have.
+        name       - (str) Case insensitive substring of the name.
+        prefix     - (str) Some word in the name starts with this.
+
+        Returns a list of Items, sorted by ID.
+        '''
+        sets = []
+
+        if type is not None:
+            sets.append(self._indexes['type'].get(type, set()))
+
+        if rarity is not None:
+            sets.append(self._indexes['rarity'].get(rarity, set()))
+
+        if level is not None:
+            levels = self._indexes['level']
+            if isinstance(level, tuple):
+                low, high = level
+                sets.append(set().union(*(ids for lvl, ids in levels.items()
+                                          if lvl is not None and
+                                          low <= lvl <= high)))
+            else:
+                sets.append(levels.get(level, set()))
+
+        for attr, values in (('flags', flags), ('game_types', game_types)):
+            for value in values or ():
+                sets.append(self._indexes[attr].get(value, set()))
+
+        if prefix is not None:
+            sets.append(self._prefix(prefix))
+
+        if not sets and name is None:
+            return sorted(self.items.values(), key=lambda x: x.id)
+
+        # Smallest first keeps the intersection cheap.
+        if sets:
+            sets.sort(key=len)
+            found = set(sets[0])
+            for ids in sets[1:]:
+                found &= ids
+        else:
+            found = set(self.items)
+
+        # Substring checks are the priciest, so they go last.
+        if name is not None and found:
+            if len(found) < len(self.items) // 8:
+                text = name.lower()
+                found = {x for x in found
+                         if text in (self.items[x].name or '').lower()}
+            else:
+                found &= self._substring(name)
+
+        return [self.items[x] for x in sorted(found)]
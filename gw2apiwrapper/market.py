@@ -0,0 +1,560 @@
+import os
+import bisect
+import time
+import threading
+from array import array
+
+
+def _numpy():
+    '''
+    numpy, imported on first use. It's optional, so only the market
+    tools need it.
+    '''
+    try:
+        import numpy
+    except ImportError:
+        raise ImportError('The market tools need numpy; install it with '
+                          '"pip install gw2apiwrapper[numpy]"') from None
+
+    return numpy
+
+
+def _field(price, name):
+    # Works on TPPrice objects and the raw JSON alike.
+    if isinstance(price, dict):
+        return price.get(name)
+    return getattr(price, name)
+
+
+def _priceRows(prices):
+    '''
+    Flatten prices into id, buy price, buy quantity, sell price,
+    sell quantity and whitelisted, one after the other.
+    '''
+    for price in prices:
+        buys = _field(price, 'buys')
+        sells = _field(price, 'sells')
+
+        yield _field(price, 'id')
+        yield buys['unit_price']
+        yield buys['quantity']
+        yield sells['unit_price']
+        yield sells['quantity']
+        yield bool(_field(price, 'whitelisted'))
+
+
+class OrderBook:
+    '''
+    One item's trading post listings as flat, sorted arrays, built
+    from a TPListing (GW2TP.getListings) or its raw dictionary.
+
+    buyPrices, buyQuantities   - Buy orders, ascending by price.
+    sellPrices, sellQuantities - Sell listings, ascending by price.
+    buyDepth  - Quantity wanted at each buy price or higher.
+    sellDepth - Quantity offered at each sell price or lower.
+
+    No numpy needed; these are stdlib arrays.
+    '''
+    __slots__ = ('id', 'buyPrices', 'buyQuantities', 'buyDepth',
+                 'sellPrices', 'sellQuantities', 'sellDepth')
+
+    def __init__(self, listing):
+        self.id = _field(listing, 'id')
+
+        self.buyPrices, self.buyQuantities = self._levels(
+            _field(listing, 'buys'))
+        self.sellPrices, self.sellQuantities = self._levels(
+            _field(listing, 'sells'))
+
+        # Buyers take the best (highest) price first, so their depth
+        # builds from the top down; sellers' from the bottom up.
+        self.buyDepth = self._cumulative(reversed(self.buyQuantities))
+        self.buyDepth.reverse()
+        self.sellDepth = self._cumulative(self.sellQuantities)
+
+    @staticmethod
+    def _levels(listings):
+        levels = sorted((x['unit_price'], x['quantity'])
+                        for x in listings or ())
+        return (array('q', (price for price, _ in levels)),
+                array('q', (quantity for _, quantity in levels)))
+
+    @staticmethod
+    def _cumulative(quantities):
+        depth, total = array('q'), 0
+        for quantity in quantities:
+            total += quantity
+            depth.append(total)
+        return depth
+
+    @property
+    def bestBuy(self):
+        '''
+        Highest buy order price, or None.
+        '''
+        return self.buyPrices[-1] if self.buyPrices else None
+
+    @property
+    def bestSell(self):
+        '''
+        Lowest sell listing price, or None.
+        '''
+        return self.sellPrices[0] if self.sellPrices else None
+
+    def depthAt(self, price, side='sells'):
+        '''
+        How many can change hands at the given unit price.
+
+        side - 'sells' for how many you could buy paying at most
+               price each, 'buys' for how many you could sell
+               getting at least price each.
+        '''
+        if side == 'sells':
+            spot = bisect.bisect_right(self.sellPrices, price)
+            return self.sellDepth[spot - 1] if spot else 0
+
+        elif side == 'buys':
+            spot = bisect.bisect_left(self.buyPrices, price)
+            return self.buyDepth[spot] if spot < len(self.buyDepth) else 0
+
+        raise ValueError('side must be "buys" or "sells"')
+
+    def diff(self, older):
+        '''
+        Price levels that changed since an older OrderBook of the
+        same item.
+
+        Returns a dictionary with the keys 'buys' and 'sells', each
+        a list of (unit_price, old quantity, new quantity) tuples,
+        ascending by price. A quantity of 0 means the level wasn't
+        there.
+        '''
+        return {'buys': self._changes(older.buyPrices, older.buyQuantities,
+                                      self.buyPrices, self.buyQuantities),
+                'sells': self._changes(older.sellPrices,
+                                       older.sellQuantities,
+                                       self.sellPrices, self.sellQuantities)}
+
+    @staticmethod
+    def _changes(oldPrices, oldQuantities, newPrices, newQuantities):
+        # Unchanged books are the common case; skip the walk.
+        if oldPrices == newPrices and oldQuantities == newQuantities:
+            return []
+
+        changes = []
+        x = y = 0
+
+        # Both sides are sorted, so walk them together.
+        while x < len(oldPrices) or y < len(newPrices):
+            old = oldPrices[x] if x < len(oldPrices) else None
+            new = newPrices[y] if y < len(newPrices) else None
+
+            if new is None or (old is not None and old < new):
+                changes.append((old, oldQuantities[x], 0))
+                x += 1
+            elif old is None or new < old:
+                changes.append((new, 0, newQuantities[y]))
+                y += 1
+            else:
+                if oldQuantities[x] != newQuantities[y]:
+                    changes.append((old, oldQuantities[x], newQuantities[y]))
+                x += 1
+                y += 1
+
+        return changes
+
+
+class PriceSnapshot:
+    '''
+    Every trading post price at one moment, stored column-wise in
+    numpy arrays sorted by item ID.
+
+    prices - TPPrice objects (eg. GW2TP.getPrices('all')) or the
+             raw dictionaries from the API.
+    taken  - (float) Unix time of the snapshot. Defaults to now.
+
+    Columns, all the same length and in the same order:
+
+    ids          - Item IDs, ascending.
+    buyPrice     - Highest buy order, in coin.
+    buyQuantity  - Items wanted by buy orders.
+    sellPrice    - Lowest sell listing, in coin.
+    sellQuantity - Items offered by sell listings.
+    whitelisted  - Whether free to play accounts can trade it.
+
+    eg.
+        snap = PriceSnapshot(tp.getPrices('all'))
+        cheap = snap.ids[(snap.roi > 0.2) & (snap.volume > 1000)]
+    '''
+    def __init__(self, prices, taken=None):
+        np = _numpy()
+        prices = list(prices)
+        count = len(prices)
+
+        self.taken = time.time() if taken is None else taken
+
+        # One pass over the prices, straight into one buffer.
+        table = np.fromiter(_priceRows(prices), dtype=np.int64,
+                            count=count * 6).reshape(count, 6)
+
+        # Sorted by ID, one contiguous row per column.
+        order = np.argsort(table[:, 0], kind='stable')
+        columns = table.T.take(order, axis=1)
+
+        (self.ids, self.buyPrice, self.buyQuantity, self.sellPrice,
+         self.sellQuantity, whitelisted) = columns
+        self.whitelisted = whitelisted.astype(bool)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __contains__(self, itemID):
+        return self.index(itemID) >= 0
+
+    def index(self, itemID):
+        '''
+        Position of an item in the columns, or -1 if it isn't there.
+        '''
+        spot = int(self.ids.searchsorted(itemID))
+        if spot < len(self.ids) and self.ids[spot] == itemID:
+            return spot
+
+        return -1
+
+    def indices(self, itemIDs):
+        '''
+        Positions of many items at once, as an array. Items that
+        aren't there get -1.
+        '''
+        np = _numpy()
+        itemIDs = np.asarray(itemIDs, dtype=np.int64)
+
+        spots = self.ids.searchsorted(itemIDs)
+        spots[spots == len(self.ids)] = 0
+
+        found = self.ids[spots] == itemIDs if len(self.ids) else False
+        return np.where(found, spots, -1)
+
+    def get(self, itemID):
+        '''
+        One item's row as a dictionary, or None if it isn't there.
+        '''
+        spot = self.index(itemID)
+        if spot < 0:
+            return None
+
+        return {'id': int(self.ids[spot]),
+                'whitelisted': bool(self.whitelisted[spot]),
+                'buys': {'unit_price': int(self.buyPrice[spot]),
+                         'quantity': int(self.buyQuantity[spot])},
+                'sells': {'unit_price': int(self.sellPrice[spot]),
+                          'quantity': int(self.sellQuantity[spot])}}
+
+    @property
+    def spread(self):
+        '''
+        Lowest sell listing minus the highest buy order, per item.
+        '''
+        return self.sellPrice - self.buyPrice
+
+    @property
+    def roi(self):
+        '''
+        Spread as a fraction of the buy price, per item. NaN where
+        there are no buy orders.
+        '''
+        np = _numpy()
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.where(self.buyPrice > 0,
+                            self.spread / self.buyPrice, np.nan)
+
+    @property
+    def volume(self):
+        '''
+        Items on both sides of the market, per item.
+        '''
+        return self.buyQuantity + self.sellQuantity
+
+
+# One row per item per snapshot. Prices fit in 32 bits; the most
+# expensive thing in the game is nowhere near 214,748 gold.
+_rowFields = [('time', '<i8'), ('id', '<i4'),
+              ('buyPrice', '<i4'), ('buyQuantity', '<i4'),
+              ('sellPrice', '<i4'), ('sellQuantity', '<i4'),
+              ('whitelisted', '?')]
+
+# One row per snapshot: when it was taken and which rows it owns.
+_indexFields = [('time', '<i8'), ('start', '<i8'), ('count', '<i8')]
+
+
+def _day(when):
+    return time.strftime('%Y-%m-%d', time.gmtime(when))
+
+
+class PriceHistory:
+    '''
+    An append-only store of PriceSnapshots on disk, for backtesting
+    and charting without a database.
+
+    path - (str) Directory to keep the history in.
+
+    Every snapshot is written as fixed width rows, sorted by item
+    ID, to a file per (UTC) day, with a small index file alongside
+    saying where each snapshot starts. Reads memory map the files,
+    so queries return numpy views over the data on disk instead of
+    loading or parsing anything.
+
+    eg.
+        history = PriceHistory('~/gw2/prices')
+        history.append(tp.getSnapshot())
+
+        rows = history.series(19721, time.time() - 30 * 86400)
+        rows['time'], rows['sellPrice']
+    '''
+    def __init__(self, path):
+        self.path = os.path.expanduser(path)
+        self._lock = threading.Lock()
+
+        # filename -> (size on disk, memmap), reopened as they grow.
+        self._maps = {}
+
+    @property
+    def rowType(self):
+        return _numpy().dtype(_rowFields)
+
+    @property
+    def indexType(self):
+        return _numpy().dtype(_indexFields)
+
+    def _files(self, day):
+        base = os.path.join(self.path, day)
+        return base + '.rows', base + '.index'
+
+    def days(self):
+        '''
+        Sorted list of days ('YYYY-MM-DD') with history.
+        '''
+        if not os.path.isdir(self.path):
+            return []
+
+        return sorted(name[:-6] for name in os.listdir(self.path)
+                      if name.endswith('.index'))
+
+    def append(self, snapshot):
+        '''
+        Write a PriceSnapshot to the end of its day's file.
+        '''
+        np = _numpy()
+
+        rows = np.empty(len(snapshot), dtype=self.rowType)
+        rows['time'] = int(snapshot.taken)
+        rows['id'] = snapshot.ids
+        rows['buyPrice'] = snapshot.buyPrice
+        rows['buyQuantity'] = snapshot.buyQuantity
+        rows['sellPrice'] = snapshot.sellPrice
+        rows['sellQuantity'] = snapshot.sellQuantity
+        rows['whitelisted'] = snapshot.whitelisted
+
+        rowFile, indexFile = self._files(_day(snapshot.taken))
+        os.makedirs(self.path, exist_ok=True)
+
+        with self._lock:
+            for name, dtype in ((rowFile, self.rowType),
+                                (indexFile, self.indexType)):
+                # Drop any half written row a crash left behind.
+                if os.path.exists(name):
+                    size = os.path.getsize(name)
+                    if size % dtype.itemsize:
+                        os.truncate(name, size - size % dtype.itemsize)
+
+            with open(rowFile, 'ab') as f:
+                start = f.tell() // self.rowType.itemsize
+                f.write(rows.tobytes())
+
+            # The index goes last, so readers never see a snapshot
+            # whose rows aren't all there yet.
+            entry = np.array([(int(snapshot.taken), start, len(rows))],
+                             dtype=self.indexType)
+            with open(indexFile, 'ab') as f:
+                f.write(entry.tobytes())
+
+    def _map(self, name, dtype):
+        '''
+        A read only memmap of a file, or an empty array.
+        '''
+        np = _numpy()
+
+        try:
+            size = os.path.getsize(name)
+        except OSError:
+            return np.empty(0, dtype=dtype)
+
+        size -= size % dtype.itemsize
+        cached = self._maps.get(name)
+        if cached is not None and cached[0] == size:
+            return cached[1]
+
+        if not size:
+            return np.empty(0, dtype=dtype)
+
+        # A plain ndarray view slices much faster than a memmap,
+        # and still keeps the mapping open.
+        mapped = np.memmap(name, dtype=dtype, mode='r',
+                           shape=(size // dtype.itemsize,)).view(np.ndarray)
+        self._maps[name] = (size, mapped)
+        return mapped
+
+    def _load(self, day):
+        '''
+        The (rows, index) memmaps for a day.
+        '''
+        rowFile, indexFile = self._files(day)
+        return (self._map(rowFile, self.rowType),
+                self._map(indexFile, self.indexType))
+
+    def snapshots(self, start=0, end=None):
+        '''
+        Yield (time, rows) for every snapshot taken between start
+        and end (Unix times, inclusive), oldest first. rows is a
+        view straight onto the file, sorted by item ID.
+        '''
+        end = time.time() if end is None else end
+
+        for day in self.days():
+            if not _day(start) <= day <= _day(end):
+                continue
+
+            rows, index = self._load(day)
+            times = index['time']
+            first = int(times.searchsorted(start))
+            last = int(times.searchsorted(end, side='right'))
+
+            for taken, offset, count in index[first:last].tolist():
+                yield taken, rows[offset:offset + count]
+
+    def at(self, when):
+        '''
+        Every item's row from the latest snapshot taken at or
+        before when (a Unix time), as a view sorted by item ID.
+        None if there's no history that far back.
+        '''
+        for day in reversed(self.days()):
+            if day > _day(when):
+                continue
+
+            rows, index = self._load(day)
+            spot = int(index['time'].searchsorted(when, side='right'))
+            if spot:
+                taken, offset, count = index[spot - 1]
+                return rows[offset:offset + count]
+
+        return None
+
+    def series(self, itemID, start=0, end=None):
+        '''
+        One item's rows from every snapshot between start and end
+        (Unix times, inclusive), oldest first, as a numpy record
+        array with the columns time, buyPrice, buyQuantity,
+        sellPrice, sellQuantity and whitelisted.
+        '''
+        np = _numpy()
+
+        found = []
+        for taken, rows in self.snapshots(start, end):
+            # Each snapshot is sorted, so a binary search only
+            # touches a handful of pages. bisect rather than
+            # searchsorted, which would copy the strided column.
+            ids = rows['id']
+            spot = bisect.bisect_left(ids, itemID)
+            if spot < len(ids) and ids[spot] == itemID:
+                found.append(rows[spot])
+
+        return np.array(found, dtype=self.rowType)
+
+
+# Trading post cuts of a sale, each at least 1 coin.
+LISTING_FEE = 0.05
+EXCHANGE_TAX = 0.10
+
+
+def sellerGets(price):
+    '''
+    Coin left from selling at price (a number or numpy array)
+    after the listing fee and exchange tax.
+    '''
+    np = _numpy()
+    price = np.asarray(price, dtype=np.int64)
+
+    def cut(rate):
+        # Rounded half up, never less than a coin.
+        return np.maximum(np.floor(price * rate + 0.5), 1).astype(np.int64)
+
+    return price - cut(LISTING_FEE) - cut(EXCHANGE_TAX)
+
+
+def flips(snapshot, top=50, by='profit', minProfit=1, minROI=None,
+          minLiquidity=None, maxBuy=None, whitelisted=None, tp=None):
+    '''
+    Rank every item in a PriceSnapshot by what flipping it would
+    make: buy at the highest buy order, sell at the lowest listing,
+    less the listing fee and exchange tax.
+
+    top          - (int) How many to return. None for all of them.
+    by           - (str) Rank by 'profit', 'roi' or 'liquidity'.
+    minProfit    - (int) Least coin made per item.
+    minROI       - (float) Least profit as a fraction of cost.
+    minLiquidity - (int) Least of buy and sell quantity.
+    maxBuy       - (int) Most coin to pay per item.
+    whitelisted  - (bool) Only (non-)whitelisted items, if given.
+    tp           - (GW2TP) If given, the listings for the results
+                   are fetched in one go and added as 'book'.
+
+    Returns a list of dictionaries, best first, with the keys id,
+    buy, sell, profit, roi and liquidity (and book).
+    '''
+    np = _numpy()
+    ranks = ('profit', 'roi', 'liquidity')
+    if by not in ranks:
+        raise ValueError('by must be one of {}'.format(', '.join(ranks)))
+
+    buy, sell = snapshot.buyPrice, snapshot.sellPrice
+    profit = sellerGets(sell) - buy
+    liquidity = np.minimum(snapshot.buyQuantity, snapshot.sellQuantity)
+
+    # Nothing to flip without both sides of the market.
+    keep = (buy > 0) & (sell > 0)
+    roi = np.where(keep, profit / np.where(keep, buy, 1), 0.0)
+
+    if minProfit is not None:
+        keep &= profit >= minProfit
+    if minROI is not None:
+        keep &= roi >= minROI
+    if minLiquidity is not None:
+        keep &= liquidity >= minLiquidity
+    if maxBuy is not None:
+        keep &= buy <= maxBuy
+    if whitelisted is not None:
+        keep &= snapshot.whitelisted == bool(whitelisted)
+
+    rows = np.flatnonzero(keep)
+    key = {'profit': profit, 'roi': roi, 'liquidity': liquidity}[by][rows]
+
+    # Only the top few need a real sort.
+    if top is not None and top < len(rows):
+        best = np.argpartition(-key, top)[:top]
+        rows, key = rows[best], key[best]
+    rows = rows[np.argsort(-key, kind='stable')]
+
+    results = [{'id': int(snapshot.ids[x]), 'buy': int(buy[x]),
+                'sell': int(sell[x]), 'profit': int(profit[x]),
+                'roi': float(roi[x]), 'liquidity': int(liquidity[x])}
+               for x in rows]
+
+    if tp is not None and results:
+        books = tp.getOrderBook([x['id'] for x in results])
+        books = {book.id: book for book in books}
+        for result in results:
+            result['book'] = books.get(result['id'])
+
+    return results
@@ -0,0 +1,201 @@
+from collections import defaultdict
+
+
+def _ingredients(recipe):
+    '''
+    (item ID, count) for each item ingredient of a recipe.
+
+    Older recipes use 'item_id', newer ones 'id' with a 'type'.
+    Currency and guild upgrade ingredients are skipped; they
+    can't be bought off the trading post anyway.
+    '''
+    for part in recipe.ingredients or ():
+        if part.get('type', 'Item') != 'Item':
+            continue
+
+        yield part.get('item_id', part.get('id')), part['count']
+
+
+class RecipeGraph:
+    '''
+    Every recipe, linked both ways, so recipe lookups and crafting
+    trees don't need the API.
+
+    Build it from GlobalAPI.getRecipe('all') (or any Recipe objects).
+
+    recipes   - {recipe ID: Recipe}
+    producers - {item ID: [recipe IDs that output it]}
+    consumers - {item ID: [recipe IDs that take it as input]}
+    '''
+    def __init__(self, recipes=()):
+        self.recipes = {}
+        self.producers = defaultdict(list)
+        self.consumers = defaultdict(list)
+
+        for recipe in recipes:
+            self.add(recipe)
+
+    def add(self, recipe):
+        '''
+        Link a Recipe into the graph.
+        '''
+        self.recipes[recipe.id] = recipe
+        self.producers[recipe.output_item_id].append(recipe.id)
+
+        for itemID, count in _ingredients(recipe):
+            self.consumers[itemID].append(recipe.id)
+
+    def search(self, in_or_out, itemID):
+        '''
+        Same as functions.recipeSearch, answered locally.
+
+        Returns a list of recipe IDs.
+        '''
+        if in_or_out == 'input':
+            return list(self.consumers.get(itemID, ()))
+
+        elif in_or_out == 'output':
+            return list(self.producers.get(itemID, ()))
+
+        raise ValueError('First argument must be "input" or "output"')
+
+    def ingredients(self, recipeID):
+        '''
+        List of (item ID, count) for a recipe's item ingredients.
+        '''
+        return list(_ingredients(self.recipes[recipeID]))
+
+
+class CraftingCost:
+    '''
+    Works out, for every item in a RecipeGraph, whether it's
+    cheaper to buy it off the trading post or to craft it,
+    recursively pricing every ingredient the same way.
+
+    graph  - (RecipeGraph) The recipes.
+    prices - TPPrice objects (eg. GW2TP.getPrices('all')), or a
+             dictionary of {item ID: unit price in coin}.
+    side   - (str) Which side of TPPrice to buy from: 'sells' to
+             buy instantly from listings, 'buys' to place orders.
+
+    Results are memoized, so pricing the whole graph touches
+    each item once. Recipe cycles are cut: an item already
+    being priced further up the tree can only be bought.
+    '''
+    def __init__(self, graph, prices, side='sells'):
+        self.graph = graph
+
+        if isinstance(prices, dict):
+            self.prices = dict(prices)
+        else:
+            self.prices = {p.id: getattr(p, side)['unit_price']
+                           for p in prices}
+
+        self._memo = {}
+        self._visiting = set()
+
+    def buyPrice(self, itemID):
+        '''
+        The trading post price, or None if it can't be bought.
+        '''
+        price = self.prices.get(itemID)
+        return price if price else None
+
+    def decide(self, itemID):
+        '''
+        Price an item both ways.
+
+        Returns a dictionary with the keys:
+
+        id     - (int) The item ID.
+        buy    - (int) Trading post price, or None.
+        craft  - (float) Cheapest cost to craft one, or None.
+        recipe - (int) The recipe behind 'craft', or None.
+        best   - (str) 'buy', 'craft' or None if neither works.
+        cost   - (float) The cheaper of the two, or None.
+        '''
+        if itemID in self._memo:
+            return self._memo[itemID]
+
+        # Depth first, but with our own stack; some crafting
+        # trees run deeper than Python's recursion limit.
+        stack = [(itemID, False)]
+        while stack:
+            current, expanded = stack.pop()
+
+            if expanded:
+                craft, recipeID = self._craft(current)
+                self._memo[current] = self._decision(
+                    current, self.buyPrice(current), craft, recipeID
+                )
+                self._visiting.discard(current)
+                continue
+
+            if current in self._memo or current in self._visiting:
+                continue
+
+            self._visiting.add(current)
+            stack.append((current, True))
+
+            for recipeID in self.graph.producers.get(current, ()):
+                for ingredient, count in self.graph.ingredients(recipeID):
+                    if (ingredient not in self._memo and
+                            ingredient not in self._visiting):
+                        stack.append((ingredient, False))
+
+        return self._memo[itemID]
+
+    def _craft(self, itemID):
+        '''
+        The cheapest recipe for one of itemID, once every
+        ingredient has been priced.
+
+        Returns a tuple of (cost, recipe ID), both None if
+        it can't be crafted from things we can price.
+        '''
+        best, bestRecipe = None, None
+
+        for recipeID in self.graph.producers.get(itemID, ()):
+            recipe = self.graph.recipes[recipeID]
+            total = 0
+
+            for ingredient, count in _ingredients(recipe):
+                decision = self._memo.get(ingredient)
+
+                # Still being priced further up; no going round.
+                if decision is None:
+                    cost = self.buyPrice(ingredient)
+                else:
+                    cost = decision['cost']
+
+                if cost is None:
+                    total = None
+                    break
+                total += cost * count
+
+            if total is None:
+                continue
+
+            total /= recipe.output_item_count or 1
+            if best is None or total < best:
+                best, bestRecipe = total, recipeID
+
+        return best, bestRecipe
+
+    def _decision(self, itemID, buy, craft, recipeID):
+        options = [(cost, how)
+                   for cost, how in ((buy, 'buy'), (craft, 'craft'))
+                   if cost is not None]
+        cost, best = min(options) if options else (None, None)
+
+        return {'id': itemID, 'buy': buy, 'craft': craft, 'recipe': recipeID,
+                'best': best, 'cost': cost}
+
+    def evaluate(self):
+        '''
+        Price every craftable item in the graph.
+
+        Returns a dictionary of {item ID: decision}. See decide().
+        '''
+        return {itemID: self.decide(itemID)
+                for itemID in list(self.graph.producers)}
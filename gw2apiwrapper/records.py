@@ -0,0 +1,221 @@
+from collections import namedtuple
+from functools import lru_cache
+
+
+# Field names for every object we build, by object name. These
+# line up with the 'obj' names in functions.crossList plus the
+# few objects built by hand (WVWObjective, WVWMatch, PVPMatch).
+#
+# ArenaNet leaves out optional keys instead of sending null, so
+# anything listed here but missing from the JSON is set to None.
+# Keys the API sends that aren't listed end up in 'extra'.
+_itemFields = ('id', 'chat_link', 'name', 'icon', 'description', 'type',
+               'rarity', 'level', 'vendor_value', 'default_skin', 'flags',
+               'game_types', 'restrictions', 'upgrades_into',
+               'upgrades_from', 'details')
+
+schemas = {
+    'Item': _itemFields,
+    'Material': _itemFields,
+    'Skin': ('id', 'name', 'type', 'flags', 'restrictions', 'icon',
+             'rarity', 'description', 'details'),
+    'Dye': ('id', 'name', 'base_rgb', 'cloth', 'leather', 'metal', 'fur',
+            'item', 'categories'),
+    'Mini': ('id', 'name', 'unlock', 'icon', 'order', 'item_id'),
+    'MaterialCategory': ('id', 'name', 'items', 'order'),
+    'Profession': ('id', 'name', 'code', 'icon', 'icon_big',
+                   'specializations', 'weapons', 'flags', 'skills',
+                   'training', 'skills_by_palette'),
+    'Race': ('id', 'name', 'skills'),
+    'Pet': ('id', 'name', 'description', 'icon', 'skills'),
+    'Mastery': ('id', 'name', 'requirement', 'order', 'background',
+                'region', 'levels'),
+    'Outfit': ('id', 'name', 'icon', 'unlock_items'),
+    'Title': ('id', 'name', 'achievement', 'achievements', 'ap_required'),
+    'Recipe': ('id', 'type', 'output_item_id', 'output_item_count',
+               'time_to_craft_ms', 'disciplines', 'min_rating', 'flags',
+               'ingredients', 'guild_ingredients', 'output_upgrade_id',
+               'chat_link'),
+    'Finisher': ('id', 'unlock_details', 'unlock_items', 'order', 'icon',
+                 'name'),
+    'Legend': ('id', 'code', 'swap', 'heal', 'elite', 'utilities'),
+    'Dungeon': ('id', 'paths'),
+    'Raid': ('id', 'wings'),
+    'Skill': ('id', 'name', 'description', 'icon', 'chat_link', 'type',
+              'weapon_type', 'professions', 'slot', 'specialization',
+              'categories', 'attunement', 'cost', 'dual_wield', 'facts',
+              'traited_facts', 'initiative', 'flip_skill', 'next_chain',
+              'prev_chain', 'transform_skills', 'bundle_skills',
+              'toolbelt_skill', 'subskills', 'flags'),
+    'ItemStat': ('id', 'name', 'attributes'),
+    'TPListing': ('id', 'buys', 'sells'),
+    'TPPrice': ('id', 'whitelisted', 'buys', 'sells'),
+    'Character': ('name', 'race', 'gender', 'flags', 'profession', 'level',
+                  'guild', 'age', 'created', 'last_modified', 'deaths',
+                  'title', 'backstory', 'crafting', 'equipment', 'bags',
+                  'skills', 'specializations', 'training',
+                  'wvw_abilities', 'equipment_pvp', 'build_tabs_unlocked',
+                  'active_build_tab', 'build_tabs',
+                  'equipment_tabs_unlocked', 'active_equipment_tab',
+                  'equipment_tabs', 'recipes'),
+    'PVPAmulet': ('id', 'name', 'icon', 'attributes'),
+    'GuildUpgrade': ('id', 'name', 'description', 'type', 'icon',
+                     'build_time', 'required_level', 'experience',
+                     'prerequisites', 'bag_max_items', 'bag_max_coins',
+                     'costs'),
+    'GuildPermission': ('id', 'name', 'description'),
+    'Guild': ('id', 'name', 'tag', 'emblem', 'level', 'motd', 'influence',
+              'aetherium', 'favor', 'resonance', 'member_count',
+              'member_capacity'),
+    'Achievement': ('id', 'icon', 'name', 'description', 'requirement',
+                    'locked_text', 'type', 'flags', 'tiers',
+                    'prerequisites', 'rewards', 'bits', 'point_cap'),
+    'AchievementGroup': ('id', 'name', 'description', 'order',
+                         'categories'),
+    'AchievementCategory': ('id', 'name', 'description', 'order', 'icon',
+                            'achievements', 'tomorrow'),
+    'WVWObjective': ('id', 'name', 'type', 'sector_id', 'map_id',
+                     'map_type', 'coord', 'label_coord', 'marker',
+                     'chat_link', 'upgrade_id'),
+    'WVWMatch': ('id', 'start_time', 'end_time', 'scores', 'worlds',
+                 'all_worlds', 'deaths', 'kills', 'victory_points',
+                 'skirmishes', 'maps'),
+    'PVPMatch': ('id', 'map_id', 'started', 'ended', 'result', 'team',
+                 'profession', 'scores', 'rating_type', 'rating_change',
+                 'season'),
+}
+
+
+class Record:
+    '''
+    Base class for the schema built object types.
+
+    Attributes are stored in __slots__, so they're a fair bit
+    smaller than a dictionary backed object. Every field in the
+    schema is always there (None if the API left it out), and
+    any key the schema doesn't know about is kept in 'extra',
+    which is None when there weren't any.
+
+    Mostly behaves like the namedtuples it replaces: _fields,
+    _asdict(), _replace(), iteration, indexing, len(), hashing
+    and comparing to tuples all work. It isn't a tuple subclass
+    though, and the fields come in schema order, not the order
+    the JSON had them in.
+    '''
+    __slots__ = ('extra',)
+    _fields = ()
+    _fieldSet = frozenset()
+
+    def __init__(self, **kwargs):
+        self._fill(kwargs)
+
+    @classmethod
+    def fromJson(cls, data):
+        '''
+        Build one of these from a JSON dictionary.
+        '''
+        self = cls.__new__(cls)
+        self._fill(data)
+        return self
+
+    def _fill(self, data):
+        get = data.get
+        for field in self._fields:
+            setattr(self, field, get(field))
+
+        if self._fieldSet.issuperset(data):
+            self.extra = None
+        else:
+            self.extra = {k: v for k, v in data.items()
+                          if k not in self._fieldSet}
+
+    def _asdict(self):
+        '''
+        Returns the object as a dictionary, extra keys included.
+        '''
+        data = {field: getattr(self, field) for field in self._fields}
+        if self.extra:
+            data.update(self.extra)
+
+        return data
+
+    def _replace(self, **kwargs):
+        '''
+        Returns a copy with the given fields replaced.
+        '''
+        data = self._asdict()
+        data.update(kwargs)
+        return self.fromJson(data)
+
+    def __iter__(self):
+        return (getattr(self, field) for field in self._fields)
+
+    def __len__(self):
+        return len(self._fields)
+
+    def __getitem__(self, index):
+        # Slices and negative indexes, same as a tuple.
+        return tuple(self)[index]
+
+    def __eq__(self, other):
+        if isinstance(other, tuple):
+            return tuple(self) == other
+
+        if type(other) is not type(self):
+            return NotImplemented
+
+        return self._asdict() == other._asdict()
+
+    def __hash__(self):
+        # Like a namedtuple, only if every field is hashable.
+        return hash(tuple(self))
+
+    def __repr__(self):
+        attrs = ', '.join('{}={!r}'.format(field, getattr(self, field))
+                          for field in self._fields)
+        return '{}({})'.format(type(self).__name__, attrs)
+
+    def __reduce__(self):
+        # The generated classes can't be found by name on import,
+        # so pickle them by rebuilding through build().
+        return (build, (type(self).__name__, self._asdict()))
+
+
+@lru_cache(maxsize=None)
+def schemaClass(name):
+    '''
+    Get the Record subclass for a registered object name,
+    building it the first time it's asked for.
+    '''
+    fields = schemas[name]
+
+    return type(name, (Record,), {
+        '__slots__': fields,
+        '_fields': fields,
+        '_fieldSet': frozenset(fields),
+    })
+
+
+@lru_cache(maxsize=1024)
+def recordClass(name, fields):
+    '''
+    Get the namedtuple class for an object name and tuple
+    of field names, building it only the first time that
+    shape is seen.
+
+    Only used for object names with no schema registered.
+    '''
+    return namedtuple(name, fields)
+
+
+def build(name, data):
+    '''
+    Build an object called name from a JSON dictionary.
+
+    Registered names always give the same Record type;
+    anything else falls back to a namedtuple of its keys.
+    '''
+    if name in schemas:
+        return schemaClass(name).fromJson(data)
+
+    return recordClass(name, tuple(data))(**data)
@@ -0,0 +1,77 @@
+import threading
+import concurrent.futures as cc
+
+
+class BoundedExecutor:
+    '''
+    A long lived thread pool with a cap on how much work can
+    be waiting for a worker at once.
+
+    submit() blocks once max_workers + max_queued tasks are
+    in flight, so a few overlapping 'all' requests can't queue
+    up hundreds of chunks (or spawn hundreds of threads).
+
+    max_workers - (int) Threads in the pool.
+    max_queued  - (int) Tasks allowed to wait for a free thread.
+                  Defaults to four times max_workers.
+    '''
+    def __init__(self, max_workers=16, max_queued=None):
+        if max_queued is None:
+            max_queued = max_workers * 4
+
+        self.max_workers = max_workers
+        self.max_queued = max_queued
+
+        self._executor = cc.ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix='gw2apiwrapper'
+        )
+        self._slots = threading.BoundedSemaphore(max_workers + max_queued)
+
+    def submit(self, fn, *args, **kwargs):
+        '''
+        Same as ThreadPoolExecutor.submit, but blocks while
+        the pool is full.
+
+        Returns a concurrent.futures.Future.
+        '''
+        self._slots.acquire()
+
+        try:
+            future = self._executor.submit(fn, *args, **kwargs)
+        except BaseException:
+            self._slots.release()
+            raise
+
+        future.add_done_callback(lambda f: self._slots.release())
+        return future
+
+    def shutdown(self, wait=True):
+        '''
+        Stop the pool. Only do this for executors you own.
+        '''
+        self._executor.shutdown(wait=wait)
+
+
+# Used by any client that wasn't handed an executor of its own.
+shared = BoundedExecutor()
+
+
+def configure(max_workers=16, max_queued=None):
+    '''
+    Replace the shared executor with one of the given size.
+
+    Clients without their own executor pick it up on
+    their next call.
+    '''
+    global shared
+
+    old, shared = shared, BoundedExecutor(max_workers, max_queued)
+    old.shutdown(wait=False)
+
+
+def getExecutor(obj):
+    '''
+    The executor a client should use: its own if it has
+    one, otherwise the shared one.
+    '''
+    return getattr(obj, 'executor', None) or shared
@@ -1,21 +1,41 @@
+from gw2apiwrapper import batching
 from gw2apiwrapper.functions import getJson, typer
+from gw2apiwrapper.market import OrderBook, PriceSnapshot, flips
 
 
 class GW2TP:
-    def __init__(self):
+    def __init__(self, executor=None):
         '''
         Initialize various bits of information.
         As in one bit. The 'basic' URL for all commerce API.
+
+        Takes an optional executor (see gw2apiwrapper.threads) used for
+        the concurrent bulk requests. Defaults to the shared one.
         '''
+        self.executor = executor
+
         # Everything here will need access to this URL.
         # So lets put it in the __init__
         self.url = 'https://api.guildwars2.com/v2/commerce/'
 
-    def getJson(self, api):
+    def getJson(self, api, meta=False, fresh=False):
         '''
         Simple wrapper for less typing.
         '''
-        return(getJson(self.url + api, header=None))
+        return(getJson(self.url + api, header=None, meta=meta, fresh=fresh))
+
+    def batch(self, window=None):
+        '''
+        Returns a context manager inside which getPrices and
+        getListings with a single ID (eg. getPrices(19684)) return
+        Futures, and the IDs are fetched together with ?ids=.
+        See gw2apiwrapper.batching.Batch.
+
+        window - (float) Also send whatever's waiting this many
+                 seconds after the first lookup, instead of only
+                 at 200 IDs or the end of the block.
+        '''
+        return batching.Batch(self, window=window)
 
     @typer
     def getListings(self, itemID):
@@ -40,6 +60,33 @@ class GW2TP:
         '''
         pass
 
+    def getOrderBook(self, itemIDs):
+        '''
+        Returns a market.OrderBook of the listings for an item ID,
+        or a list of them for a list of IDs (or 'all').
+        '''
+        listings = self.getListings(itemIDs)
+        if isinstance(listings, list):
+            return [OrderBook(x) for x in listings]
+
+        return OrderBook(listings)
+
+    def getSnapshot(self, itemIDs='all'):
+        '''
+        Returns a market.PriceSnapshot of the prices for the given
+        item IDs, all of them by default. Needs numpy.
+        '''
+        return PriceSnapshot(self.getPrices(itemIDs))
+
+    def getFlips(self, top=50, **filters):
+        '''
+        The best items to flip right now, from one bulk price
+        fetch, with their order books attached. Needs numpy.
+
+        Takes the same filters as market.flips.
+        '''
+        return flips(self.getSnapshot(), top=top, tp=self, **filters)
+
     def getExchange(self, coin_or_gems, quantity):
         '''
         Returns a dictionary of the current exchange rate
@@ -0,0 +1,374 @@
+import time
+import hashlib
+import random
+import http.client
+import threading
+import email.utils
+import concurrent.futures as cc
+import urllib.parse
+from gw2apiwrapper import threads
+
+
+class Response:
+    '''
+    The bits of an HTTP response we actually care about.
+
+    status  - (int) HTTP status code.
+    reason  - (str) HTTP reason phrase.
+    headers - (HTTPMessage) Response headers.
+    body    - (bytes) The raw, undecoded body.
+    '''
+    __slots__ = ('status', 'reason', 'headers', 'body')
+
+    def __init__(self, status, reason, headers, body):
+        self.status = status
+        self.reason = reason
+        self.headers = headers
+        self.body = body
+
+
+class ConnectionPool:
+    '''
+    A thread-safe stash of keep-alive HTTP(S) connections, kept
+    per host, so back to back requests don't pay for a brand new
+    TCP + TLS handshake every single time.
+
+    maxsize - (int) Idle connections kept around per host.
+              Defaults to the shared executor's worker count, so
+              a full burst of chunks doesn't close any.
+    timeout - (int) Socket timeout in seconds.
+    '''
+    def __init__(self, maxsize=None, timeout=30):
+        if maxsize is None:
+            maxsize = threads.shared.max_workers
+
+        self.maxsize = maxsize
+        self.timeout = timeout
+
+        # (scheme, host, port) -> list of idle connections.
+        self._idle = {}
+        self._lock = threading.Lock()
+
+    def _checkout(self, key):
+        '''
+        Hand out an idle connection for the host if we have one,
+        otherwise build a new one.
+
+        Returns a tuple of (connection, reused).
+        '''
+        with self._lock:
+            idle = self._idle.get(key)
+            if idle:
+                return idle.pop(), True
+
+        scheme, host, port = key
+
+        if scheme == 'https':
+            conn = http.client.HTTPSConnection(host, port,
+                                               timeout=self.timeout)
+        else:
+            conn = http.client.HTTPConnection(host, port,
+                                              timeout=self.timeout)
+
+        return conn, False
+
+    def _checkin(self, key, conn):
+        '''
+        Return a connection to the pool, or close it if the
+        pool for that host is already full.
+        '''
+        with self._lock:
+            idle = self._idle.setdefault(key, [])
+            if len(idle) < self.maxsize:
+                idle.append(conn)
+                return
+
+        conn.close()
+
+    def clear(self):
+        '''
+        Close every idle connection in the pool.
+        '''
+        with self._lock:
+            idle, self._idle = self._idle, {}
+
+        for conns in idle.values():
+            for conn in conns:
+                conn.close()
+
+    def request(self, url, header=None):
+        '''
+        GET the given URL over a pooled connection.
+
+        Returns a Response.
+        '''
+        parts = urllib.parse.urlsplit(url)
+        key = (parts.scheme, parts.hostname, parts.port)
+
+        path = parts.path or '/'
+        if parts.query:
+            path = '{}?{}'.format(path, parts.query)
+
+        while True:
+            conn, reused = self._checkout(key)
+
+            try:
+                conn.request('GET', path, headers=header or {})
+                response = conn.getresponse()
+                body = response.read()
+            except (http.client.HTTPException, OSError):
+                conn.close()
+
+                # The server is free to drop idle keep-alive connections
+                # whenever it likes, so a reused one gets another go
+                # on a fresh connection. A fresh one failing is real.
+                if reused:
+                    continue
+                raise
+
+            if response.will_close:
+                conn.close()
+            else:
+                self._checkin(key, conn)
+
+            return Response(response.status, response.reason,
+                            response.headers, body)
+
+
+class RateLimiter:
+    '''
+    A token bucket shared by every request in the process, so
+    bursts of chunked requests stay inside the API's budget
+    instead of getting us a 429.
+
+    rate  - (int) Requests allowed per 'per' seconds.
+    per   - (int) The period, in seconds.
+    burst - (int) Requests allowed back to back before we have
+            to wait on the refill. Defaults to 300, half of the
+            API's per minute budget; None allows a full 'rate'.
+    '''
+    def __init__(self, rate=600, per=60, burst=300):
+        self.rate = rate / per
+        self.burst = burst if burst is not None else rate
+
+        self._tokens = float(self.burst)
+        self._last = time.monotonic()
+        self._pausedUntil = 0.0
+        self._lock = threading.Lock()
+
+    def reserve(self):
+        '''
+        Take a token if one is free.
+
+        Returns 0 if we got one, otherwise how many seconds
+        to wait before asking again.
+        '''
+        with self._lock:
+            now = time.monotonic()
+
+            # Refill for however long it's been.
+            elapsed = now - self._last
+            self._tokens = min(self.burst, self._tokens + elapsed * self.rate)
+            self._last = now
+
+            if now < self._pausedUntil:
+                return self._pausedUntil - now
+
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0
+
+            return (1 - self._tokens) / self.rate
+
+    def acquire(self):
+        '''
+        Block until we're allowed to send a request.
+        '''
+        wait = self.reserve()
+        while wait:
+            time.sleep(wait)
+            wait = self.reserve()
+
+    def pause(self, seconds):
+        '''
+        Hold everyone for the given number of seconds. Used when
+        the server tells us to back off.
+        '''
+        with self._lock:
+            until = time.monotonic() + seconds
+            self._pausedUntil = max(self._pausedUntil, until)
+            self._tokens = 0.0
+
+
+def _retryAfter(response):
+    '''
+    Seconds to wait according to the Retry-After header, or
+    None if there isn't a usable one.
+    '''
+    value = response.headers.get('Retry-After')
+    if value is None:
+        return None
+
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+
+    # It's allowed to be a date as well.
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+
+    return max(0.0, when.timestamp() - time.time())
+
+
+def retryDelay(response, attempt):
+    '''
+    How long to wait before retrying a request, or None if
+    the response shouldn't be retried at all.
+
+    response is None for connection errors.
+    '''
+    if response is not None:
+        if response.status != 429 and response.status < 500:
+            return None
+
+        delay = _retryAfter(response)
+        if delay is not None:
+            return delay
+
+    # Full jitter, so a burst of failures doesn't retry in lockstep.
+    return random.uniform(0, backoff * 2 ** attempt)
+
+
+def giveUp(url, response=None, error=None):
+    '''
+    The ConnectionError raised once we're out of retries.
+    '''
+    if response is not None:
+        error = '{} {}'.format(response.status, response.reason)
+
+    return ConnectionError('Gave up after {} tries: {} | URL: {}'.format(
+        retries + 1, error, url
+    ))
+
+
+def requestKey(url, header=None):
+    '''
+    Normalize a URL and the auth it was sent with into a key,
+    for caching and coalescing requests.
+
+    The host is lowercased and the query parameters sorted so
+    trivially different URLs match. The API key is hashed, so
+    authenticated responses are only ever shared with the
+    same key.
+    '''
+    parts = urllib.parse.urlsplit(url)
+    query = urllib.parse.urlencode(
+        sorted(urllib.parse.parse_qsl(parts.query, keep_blank_values=True)),
+        safe=','
+    )
+
+    scope = ''
+    if header and header.get('Authorization'):
+        auth = header['Authorization'].encode('UTF-8')
+        scope = hashlib.sha256(auth).hexdigest()[:16]
+
+    return (scope, parts.scheme.lower(), parts.netloc.lower(),
+            parts.path, query)
+
+
+class SingleFlight:
+    '''
+    Lets concurrent identical calls share one execution. The first
+    caller for a key runs it; everyone else arriving before it's
+    done waits and gets the same result (or exception).
+    '''
+    def __init__(self):
+        self._flights = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, function, *args):
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = cc.Future()
+
+        if not leader:
+            return flight.result()
+
+        try:
+            result = function(*args)
+        except BaseException as e:
+            flight.set_exception(e)
+            raise
+        else:
+            flight.set_result(result)
+            return result
+        finally:
+            # Done; the next caller starts a fresh request.
+            with self._lock:
+                del self._flights[key]
+
+
+def fetch(url, header=None):
+    '''
+    GET the given URL over the shared pool, waiting on the shared
+    rate limiter first.
+
+    429s, 5xx responses and connection errors are retried up to
+    'retries' times with jittered exponential backoff, honoring
+    Retry-After when the server sends it.
+
+    Identical requests made at the same time, from any thread,
+    are coalesced into one when 'coalesce' is set. Everyone gets
+    the same Response.
+
+    Returns the final Response. Raises ConnectionError if the
+    server still won't cooperate after all of the retries.
+    '''
+    if coalesce:
+        return flights.do(requestKey(url, header), _fetch, url, header)
+
+    return _fetch(url, header)
+
+
+def _fetch(url, header):
+    for attempt in range(retries + 1):
+        limiter.acquire()
+
+        try:
+            response = pool.request(url, header)
+        except (http.client.HTTPException, OSError) as e:
+            if attempt == retries:
+                raise giveUp(url, error=e) from e
+            time.sleep(retryDelay(None, attempt))
+            continue
+
+        delay = retryDelay(response, attempt)
+        if delay is None:
+            return response
+
+        if attempt == retries:
+            raise giveUp(url, response)
+
+        # Too many requests is everyone's problem, not just ours.
+        if response.status == 429:
+            limiter.pause(delay)
+        else:
+            time.sleep(delay)
+
+
+# Shared by every GlobalAPI, AccountAPI and GW2TP in the process.
+pool = ConnectionPool()
+limiter = RateLimiter()
+flights = SingleFlight()
+
+# Whether fetch() shares in-flight requests between callers.
+coalesce = True
+
+# How many times fetch() retries, and the base backoff in seconds.
+retries = 4
+backoff = 0.5
@@ -6,7 +6,7 @@ with open('README.rst') as f:
 
 setup(
     name='gw2apiwrapper',
-    version='2.7.5',
+    version='3.0.0',
     description='A simple wrapper around the offical Guild Wars 2 JSON API.',
     long_description=long_desc,
     url='https://github.com/PatchesPrime/gw2apiwrapper.git',
@@ -15,6 +15,7 @@ setup(
     license='MIT',
     packages=['gw2apiwrapper'],
     # install_requires=['requests'],
+    extras_require={'numpy': ['numpy']},
     classifiers=[
         'Development Status :: 4 - Beta',
         'Environment :: Console',
@@ -25,6 +26,6 @@ setup(
         'Topic :: Games/Entertainment',
     ],
     keywords='guild wars gw2 arenanet api wrapper',
-    python_requires='>=3.5',
+    python_requires='>=3.7',
     zip_safe=False
 )
@@ -0,0 +1,107 @@
+import json
+import urllib.parse
+import pytest
+from http.client import HTTPMessage
+from gw2apiwrapper import cache, functions, transport
+from gw2apiwrapper.transport import Response
+
+
+class FakeAPI:
+    '''
+    Stands in for transport.fetch, serving catalogs from memory the
+    way the real API does: the ID list, ?ids= (206 when some are
+    missing, 404 when all are, 400 when one isn't a number),
+    ?ids=all, ?page= and single IDs.
+    '''
+    def __init__(self):
+        # endpoint -> {id: JSON}
+        self.catalogs = {}
+
+        # Every URL asked for, in order, and the header it came with.
+        self.requests = []
+        self.headers = []
+
+        # (status, text) to answer everything with instead.
+        self.failure = None
+
+    def response(self, status, data, headers=()):
+        message = HTTPMessage()
+        for name, value in headers:
+            message[name] = value
+
+        return Response(status, 'Fake', message,
+                        json.dumps(data).encode('UTF-8'))
+
+    def byID(self, catalog):
+        # IDs arrive as strings; catalogs can be keyed by numbers.
+        return {str(key): value for key, value in catalog.items()}
+
+    def __call__(self, url, header=None):
+        self.requests.append(url)
+        self.headers.append(header)
+
+        if self.failure is not None:
+            status, text = self.failure
+            return self.response(status, {'text': text})
+
+        parts = urllib.parse.urlsplit(url)
+        path = urllib.parse.unquote(parts.path.split('/v2/', 1)[1])
+        path = path.strip('/')
+        query = dict(urllib.parse.parse_qsl(parts.query))
+
+        endpoint, _, single = path.rpartition('/')
+        if endpoint in self.catalogs:
+            found = self.byID(self.catalogs[endpoint]).get(single)
+            if found is None:
+                return self.response(404, {'text': 'no such id'})
+            return self.response(200, found)
+
+        catalog = self.catalogs.get(path)
+        if catalog is None:
+            return self.response(404, {'text': 'not found'})
+
+        if 'page' in query:
+            size = int(query.get('page_size', 50))
+            page = int(query['page'])
+            keys = sorted(catalog)
+            pages = -(-len(keys) // size)
+
+            return self.response(
+                200, [catalog[x] for x in keys[page * size:][:size]],
+                [('X-Page-Total', str(pages)), ('X-Page-Size', str(size)),
+                 ('X-Result-Total', str(len(keys)))]
+            )
+
+        if query.get('ids') == 'all':
+            return self.response(200, [catalog[x] for x in sorted(catalog)])
+
+        if 'ids' in query:
+            ids = query['ids'].split(',')
+            numeric = all(isinstance(x, int) for x in catalog)
+            if numeric and not all(x.isdigit() for x in ids):
+                return self.response(400, {'text': 'invalid id list'})
+
+            byID = self.byID(catalog)
+            found = [byID[x] for x in ids if x in byID]
+
+            if not found:
+                return self.response(404, {'text': 'all ids invalid'})
+            return self.response(206 if len(found) < len(ids) else 200,
+                                 found)
+
+        return self.response(200, sorted(catalog))
+
+
+@pytest.fixture
+def fakeAPI(monkeypatch):
+    '''
+    A FakeAPI in place of the network, with empty caches.
+    '''
+    fake = FakeAPI()
+    monkeypatch.setattr(transport, 'fetch', fake)
+    monkeypatch.setattr(functions, 'responseCache',
+                        cache.ResponseCache(functions.cacheTTLs))
+    monkeypatch.setattr(functions, 'diskCache', None)
+    monkeypatch.setattr(functions, 'badIDs', cache.NegativeCache())
+
+    return fake
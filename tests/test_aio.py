@@ -0,0 +1,113 @@
+import asyncio
+import threading
+import pytest
+from gw2apiwrapper import AsyncGlobalAPI, AsyncGW2TP, aio, cache, functions
+from gw2apiwrapper.transport import Response
+
+
+def run(coro):
+    # A fresh event loop per test.
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coro)
+    finally:
+        loop.close()
+
+
+def test_getItem():
+    async def go():
+        gAPI = AsyncGlobalAPI()
+
+        # Test int()
+        item = await gAPI.getItem(28445)
+        assert type(item).__name__ == 'Item'
+        assert item.name == 'Strong Soft Wood Longbow of Fire'
+
+        # Test str()
+        item = await gAPI.getItem('12452')
+        assert item.name == 'Omnomberry Bar'
+
+        # Test list(), in order.
+        items = await gAPI.getItem([28445, 12452])
+        assert [x.id for x in items] == [28445, 12452]
+
+        # Test unsupported type
+        with pytest.raises(NotImplementedError):
+            await gAPI.getItem({28445})
+
+    run(go())
+
+
+def test_getLegend():
+    async def go():
+        assert len(await AsyncGlobalAPI().getLegend('all')) > 3
+
+    run(go())
+
+
+def test_getPrices():
+    async def go():
+        prices = await AsyncGW2TP().getPrices([19684, 19709])
+
+        for item in prices:
+            assert type(item).__name__ == 'TPPrice'
+
+    run(go())
+
+
+def test_diskCacheOffLoop(tmp_path, monkeypatch):
+    # Checking the build and touching files can't block the loop.
+    loopThread = threading.current_thread()
+    builds = []
+
+    def getBuild():
+        builds.append(threading.current_thread())
+        return 1
+
+    async def fetch(url, header=None, conn=None):
+        return Response(200, 'OK', {}, b'[1, 2]')
+
+    monkeypatch.setattr(aio, 'fetch', fetch)
+    monkeypatch.setattr(functions, 'responseCache', None)
+    monkeypatch.setattr(functions, 'diskCache', cache.DiskCache(
+        str(tmp_path), getBuild=getBuild
+    ))
+
+    url = 'https://api.guildwars2.com/v2/items'
+    assert run(aio.getJson(url)) == [1, 2]
+    assert run(aio.getJson(url, meta=True)).cached
+
+    assert builds and loopThread not in builds
+
+
+def test_fetchCoalesced(monkeypatch):
+    calls = []
+
+    async def fetch(url, header, conn):
+        calls.append(url)
+        await asyncio.sleep(0.05)
+        if 'fail' in url:
+            raise ConnectionError('nope')
+        return Response(200, 'OK', {}, url.encode('UTF-8'))
+
+    monkeypatch.setattr(aio, '_fetch', fetch)
+    url = 'https://api.guildwars2.com/v2/commerce/prices/19976'
+
+    async def go(url, header=None, times=5):
+        return await asyncio.gather(*(
+            aio.fetch(url, header) for x in range(times)
+        ), return_exceptions=True)
+
+    responses = run(go(url))
+    assert calls == [url] and all(x is responses[0] for x in responses)
+
+    # Different keys, and anything after the first finished, are
+    # separate requests.
+    run(go(url, {'Authorization': 'Bearer key'}, 1))
+    run(go(url, times=1))
+    assert calls == [url] * 3
+
+    # Failures are shared too.
+    errors = run(go(url + '/fail', times=3))
+    assert len(calls) == 4 and all(x is errors[0] for x in errors)
+    assert isinstance(errors[0], ConnectionError)
@@ -0,0 +1,123 @@
+import pytest
+from gw2apiwrapper import cache, functions, records
+from gw2apiwrapper.transport import Response
+
+BASE = 'https://api.guildwars2.com/v2/'
+
+
+def response(body=b'[]', status=200):
+    return Response(status, 'OK', {}, body)
+
+
+def test_ttlFor():
+    policies = functions.cacheTTLs
+    rc = cache.ResponseCache(policies)
+
+    assert rc.ttlFor(BASE + 'items/12452') == cache.DAY
+    assert rc.ttlFor(BASE + 'commerce/prices?ids=19684') == 30
+    assert rc.ttlFor(BASE + 'achievements/daily') == 5 * cache.MINUTE
+    assert rc.ttlFor(BASE + 'achievements/groups') == cache.DAY
+
+    # Authenticated stuff isn't cached.
+    assert rc.ttlFor(BASE + 'account/bank') == 0
+
+
+def test_getPut():
+    rc = cache.ResponseCache({'items': cache.DAY})
+
+    rc.put(BASE + 'items?ids=1,2&lang=en', None, response())
+    assert rc.get(BASE + 'items?lang=en&ids=1,2') is not None
+
+    # Different key, different entry.
+    assert rc.get(BASE + 'items?ids=1,2', {'Authorization': 'x'}) is None
+
+    # Failures and uncached endpoints are skipped.
+    rc.put(BASE + 'items/3', None, response(status=404))
+    rc.put(BASE + 'account/bank', None, response())
+    assert len(rc) == 1
+
+
+def test_eviction():
+    rc = cache.ResponseCache({'items': cache.DAY}, maxEntries=2)
+
+    for x in range(3):
+        rc.put(BASE + 'items/{}'.format(x), None, response())
+
+    assert rc.get(BASE + 'items/0') is None
+    assert rc.get(BASE + 'items/2') is not None
+
+    rc = cache.ResponseCache({'items': cache.DAY}, maxBytes=10)
+    rc.put(BASE + 'items/1', None, response(b'123456'))
+    rc.put(BASE + 'items/2', None, response(b'123456'))
+    assert len(rc) == 1
+
+
+def test_diskCache(tmp_path):
+    build = [100]
+    dc = cache.DiskCache(str(tmp_path), checkEvery=0,
+                         getBuild=lambda: build[0])
+
+    dc.put(BASE + 'items?ids=1', None, response(b'[{"id": 1}]'))
+    assert dc.get(BASE + 'items?ids=1').body == b'[{"id": 1}]'
+    assert [x.suffix for x in (tmp_path / '100').iterdir()] == ['.json']
+
+    # Only static, unauthenticated endpoints.
+    dc.put(BASE + 'achievements/daily', None, response())
+    dc.put(BASE + 'items?ids=2', {'Authorization': 'x'}, response())
+    assert dc.get(BASE + 'achievements/daily') is None
+    assert dc.get(BASE + 'items?ids=2') is None
+
+    # New build, fresh start.
+    build[0] = 101
+    assert dc.get(BASE + 'items?ids=1') is None
+    assert not (tmp_path / '100').exists()
+
+
+def test_negativeCache(fakeAPI, monkeypatch):
+    bad = cache.NegativeCache(ttl=60)
+    bad.add('items', [1, '2'])
+
+    assert bad.known('items', '1') and bad.known('items', 2)
+    assert not bad.known('items', 3) and not bad.known('skins', 1)
+    assert not bad.known('items', 1, 'somekey')
+
+    # Bulk fetches skip known bad IDs and remember new ones.
+    monkeypatch.setattr(functions, 'badIDs', bad)
+    fakeAPI.catalogs['items'] = {x: {'id': x} for x in range(100)}
+    url = BASE + 'items'
+    bad.add(url, [1])
+
+    def caller(url, meta=False):
+        return functions.getJson(url, meta=meta, fresh=True)
+
+    data = functions.fetchChunk(caller, url, [1, 5, 'oops', 500, 7])
+    assert sorted(x['id'] for x in data) == [5, 7]
+    assert fakeAPI.requests[0] == url + '?ids=5,oops,500,7'
+    assert bad.known(url, 500)
+
+    # The malformed one got the request rejected, which isn't the
+    # API saying it doesn't exist.
+    assert not bad.known(url, 'oops')
+
+    fakeAPI.requests.clear()
+    functions.fetchChunk(caller, url, [1, 5, 500, 7])
+    assert fakeAPI.requests == [url + '?ids=5,7']
+
+    # Other failures aren't bisected or remembered.
+    fakeAPI.requests.clear()
+    fakeAPI.failure = (503, 'ErrBusy')
+    with pytest.raises(ConnectionError):
+        functions.fetchChunk(caller, url, [10, 11, 12])
+    assert len(fakeAPI.requests) == 1
+    assert not any(bad.known(url, x) for x in (10, 11, 12))
+
+    fakeAPI.failure = (400, 'invalid lang')
+    with pytest.raises(ConnectionError):
+        functions.fetchChunk(caller, url, [10, 11, 12])
+    assert len(fakeAPI.requests) == 2
+
+    # Results say what's missing.
+    objects = functions.orderResults([records.build('Item', {'id': 5})],
+                                     ['5', '500', 'oops'], 'Item')
+    assert [x.id for x in objects] == [5]
+    assert objects.missing == [500, 'oops']
@@ -1,5 +1,6 @@
 import pytest
-from gw2apiwrapper import GlobalAPI
+import threading
+from gw2apiwrapper import GlobalAPI, cache, functions
 
 # This object retains nothing, so it's fine for it
 # to be reused.
@@ -462,3 +463,252 @@ def test_getDailies():
     assert len(dailies) > 10
 
     dailies = gAPI.getDailies(tomorrow=True)
+
+
+def test_stream():
+    # Generator instead of a list.
+    legends = gAPI.getLegend('all', stream=True)
+    assert not isinstance(legends, list)
+
+    legends = list(legends)
+    assert len(legends) > 3
+
+    for unit in legends:
+        assert type(unit).__name__ == 'Legend'
+
+    # Lists stream too.
+    for unit in gAPI.getSkill([5516, 5517, '14375'], stream=True):
+        assert type(unit).__name__ == 'Skill'
+
+
+def test_bulkOrder():
+    # Caller's order, duplicates dropped.
+    items = gAPI.getItem([12452, 28445, '12452', 12452])
+    assert [x.id for x in items] == [12452, 28445]
+
+    # Or as a mapping.
+    items = gAPI.getItem([28445, 12452], mapping=True)
+    assert list(items.keys()) == [28445, 12452]
+    assert items[12452].name == 'Omnomberry Bar'
+
+
+def test_syncCatalog():
+    store = {}
+
+    result = gAPI.syncCatalog('legends', store)
+    assert result['added'] > 3
+    assert len(store) == result['added']
+
+    for key, unit in store.items():
+        assert type(unit).__name__ == 'Legend'
+        assert unit.id == key
+
+    # Nothing new the second time around.
+    result = gAPI.syncCatalog('legends', store, sample=2)
+    assert result['added'] == 0
+    assert result['refreshed'] == 2
+
+
+def test_syncCatalogFresh(fakeAPI):
+    fakeAPI.catalogs['items'] = {x: {'id': x, 'name': 'Old'} for x in (1, 2)}
+    api = GlobalAPI()
+    store = {}
+
+    assert api.syncCatalog('items', store)['added'] == 2
+
+    # A new build; the ID list and refreshed objects can't come
+    # from the (day long) cache.
+    fakeAPI.catalogs['items'][3] = {'id': 3, 'name': 'New'}
+    fakeAPI.catalogs['items'][1]['name'] = 'Changed'
+
+    result = api.syncCatalog('items', store, sample=1)
+    assert result == {'added': 1, 'refreshed': 1, 'removed': 0}
+    assert store[3].name == 'New' and store[1].name == 'Changed'
+
+
+def test_batch():
+    with gAPI.batch():
+        bar = gAPI.getItem(12452)
+        skill = gAPI.getSkill(5516)
+        again = gAPI.getItem('12452')
+        bad = gAPI.getItem(1)
+
+    assert bar.result().name == 'Omnomberry Bar'
+    assert again.result().id == 12452
+    assert type(skill.result()).__name__ == 'Skill'
+
+    with pytest.raises(ValueError):
+        bad.result()
+
+    # Back to normal outside the block.
+    assert gAPI.getItem(12452).name == 'Omnomberry Bar'
+
+
+def test_paged():
+    # Same objects either way, without the ID list round trip.
+    paged = [x.id for x in gAPI.getLegend('all', paged=True)]
+    assert sorted(paged) == sorted(x.id for x in gAPI.getLegend('all'))
+
+    objectives = gAPI.getWVWObjective('all', paged=True)
+    assert all(type(x).__name__ == 'WVWObjective' for x in objectives)
+
+
+def test_getWVWMatchesAll(fakeAPI):
+    fakeAPI.catalogs['wvw/matches'] = {1: {'id': '1-1'}, 2: {'id': '2-1'}}
+
+    matches = GlobalAPI().getWVWMatches('all')
+    assert [x.id for x in matches] == ['1-1', '2-1']
+    assert all(type(x).__name__ == 'WVWMatch' for x in matches)
+
+
+def test_pagedDiskCache(fakeAPI, tmp_path, monkeypatch):
+    fakeAPI.catalogs['items'] = {x: {'id': x} for x in range(1, 451)}
+    monkeypatch.setattr(functions, 'diskCache', cache.DiskCache(
+        str(tmp_path), getBuild=lambda: 1
+    ))
+    api = GlobalAPI()
+
+    assert len(api.getItem('all', paged=True)) == 450
+
+    # A restart: only the disk cache, which keeps no headers, is left.
+    functions.responseCache.clear()
+    assert len(api.getItem('all', paged=True)) == 450
+
+
+def test_batchRejected(fakeAPI):
+    fakeAPI.catalogs['items'] = {1: {'id': 1}, 2: {'id': 2}}
+    api = GlobalAPI()
+
+    with api.batch():
+        good = api.getItem(1)
+        missing = api.getItem(3)
+        malformed = api.getItem('oops')
+
+    # The malformed ID is split off instead of sinking the batch.
+    assert good.result().id == 1
+    for lookup in (missing, malformed):
+        with pytest.raises(ValueError):
+            lookup.result()
+
+    fakeAPI.failure = (503, 'ErrBusy')
+    with api.batch():
+        down = api.getItem(2)
+
+    with pytest.raises(ConnectionError):
+        down.result()
+
+
+def test_badIDScope(fakeAPI):
+    fakeAPI.catalogs['items'] = {1: {'id': 1}}
+    url = GlobalAPI().url + 'items'
+
+    def caller(url, meta=False):
+        return functions.getJson(url, meta=meta, fresh=True)
+
+    functions.fetchChunks(caller, url, [1, 2], 'Item', scope='key')
+    assert functions.badIDs.known(url, 2, 'key')
+
+    # Another key (or none) still asks.
+    fakeAPI.requests.clear()
+    assert functions.fetchChunks(caller, url, [1, 2], 'Item').missing == [2]
+    assert fakeAPI.requests == [url + '?ids=1,2']
+
+
+def test_typerBinding():
+    # Looked up on the class, it's still the decorated method.
+    assert GlobalAPI.getItem.__name__ == 'getItem'
+    assert 'item API' in GlobalAPI.getItem.__doc__
+
+    # Each client, from its own thread, gets its own bound method.
+    clients = [GlobalAPI(), GlobalAPI()]
+    bound = {}
+
+    def lookup(client):
+        bound[id(client)] = client.getItem
+
+    workers = [threading.Thread(target=lookup, args=(x,)) for x in clients]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+    for client in clients:
+        method = bound[id(client)]
+        assert method.__self__ is client
+        assert client.getItem is method
+
+
+def test_errorStatuses(fakeAPI):
+    fakeAPI.catalogs['items'] = {1: {'id': 1}}
+    api = GlobalAPI()
+
+    # Nothing unsuccessful comes back as None.
+    fakeAPI.failure = (400, 'invalid lang')
+    with pytest.raises(ConnectionError):
+        api.getItem(1)
+
+    fakeAPI.failure = (401, 'Invalid access token')
+    with pytest.raises(PermissionError):
+        api.getJson('tokeninfo')
+
+    # Unless asked for the whole response, to look at first.
+    response = api.getJson('items/1', meta=True)
+    assert (response.status, response.data) == (401, None)
+    assert response.error == 'Invalid access token' and not response.ok
+    with pytest.raises(PermissionError):
+        response.check()
+
+    fakeAPI.failure = None
+    assert api.getJson('items/1', meta=True).check().data == {'id': 1}
+
+
+def test_idsQuoted(fakeAPI):
+    fakeAPI.catalogs['characters'] = {
+        name: {'name': name} for name in ('Patches Prime', 'Alt')
+    }
+    url = GlobalAPI().url + 'characters'
+
+    def caller(url, meta=False):
+        return functions.getJson(url, meta=meta, fresh=True)
+
+    found = functions.fetchChunks(caller, url, ['Patches Prime', 'Alt'],
+                                  'Character', scope='key')
+    assert sorted(x.name for x in found) == ['Alt', 'Patches Prime']
+    assert fakeAPI.requests == [url + '?ids=Patches%20Prime,Alt']
+
+    # A 404 that isn't about the IDs isn't them being bad.
+    with pytest.raises(ValueError):
+        functions.fetchChunks(caller, url + 's', ['Alt'], 'Character')
+    assert not functions.badIDs.known(url + 's', 'Alt')
+
+    # One that is, is.
+    assert functions.fetchChunks(caller, url, ['Gone Guy'], 'Character',
+                                 scope='key') == []
+    assert functions.badIDs.known(url, 'Gone Guy', 'key')
+
+
+def test_streamDeduped(fakeAPI):
+    fakeAPI.catalogs['items'] = {1: {'id': 1}, 2: {'id': 2}}
+
+    items = list(GlobalAPI().getItem([1, '1', 2], stream=True))
+    assert sorted(x.id for x in items) == [1, 2]
+    assert fakeAPI.requests[-1].endswith('items?ids=1,2')
+
+
+def test_newBuildClearsMemory(fakeAPI, tmp_path, monkeypatch):
+    fakeAPI.catalogs['items'] = {1: {'id': 1, 'name': 'Old'}}
+    build = [1]
+    monkeypatch.setattr(functions, 'diskCache', cache.DiskCache(
+        str(tmp_path), checkEvery=0, getBuild=lambda: build[0]
+    ))
+    api = GlobalAPI()
+
+    assert api.getItem(1).name == 'Old'
+
+    # Same build: served from the caches.
+    fakeAPI.catalogs['items'][1]['name'] = 'New'
+    assert api.getItem(1).name == 'Old'
+
+    # New build: not from disk, and not from memory either.
+    build[0] = 2
+    assert api.getItem(1).name == 'New'
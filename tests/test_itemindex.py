@@ -0,0 +1,53 @@
+from gw2apiwrapper import records
+from gw2apiwrapper.itemindex import ItemIndex
+
+
+def item(itemID, name, type, rarity, level, flags=(), game_types=('PvE',)):
+    return records.build('Item', {
+        'id': itemID, 'name': name, 'type': type, 'rarity': rarity,
+        'level': level, 'flags': list(flags), 'game_types': list(game_types)
+    })
+
+
+index = ItemIndex([
+    item(1, 'Mist Pendant', 'Trinket', 'Ascended', 80, ['AccountBound']),
+    item(2, 'Mistborn Mote', 'Trinket', 'Ascended', 80),
+    item(3, 'Mist Ring', 'Trinket', 'Exotic', 80, game_types=['WvW']),
+    item(4, 'Mystic Coin', 'CraftingMaterial', 'Rare', 0),
+    item(5, 'Amulet of the Mists', 'Trinket', 'Ascended', 70),
+])
+
+
+def test_query():
+    found = index.query(type='Trinket', rarity='Ascended', level=80,
+                        name='Mist')
+    assert [x.id for x in found] == [1, 2]
+
+    assert [x.id for x in index.query(level=(70, 80), rarity='Ascended')] \
+        == [1, 2, 5]
+    assert [x.id for x in index.query(flags=['AccountBound'])] == [1]
+    assert [x.id for x in index.query(game_types=['WvW'])] == [3]
+    assert index.query(type='Nope') == []
+
+
+def test_nameSearch():
+    # Word prefixes.
+    assert [x.id for x in index.query(prefix='mist')] == [1, 2, 3, 5]
+    assert [x.id for x in index.query(prefix='myst')] == [4]
+
+    # Anywhere in the name.
+    assert [x.id for x in index.query(name='ists')] == [5]
+    assert [x.id for x in index.query(name='ic c')] == [4]
+
+
+def test_addRemove():
+    local = ItemIndex()
+    local.add(item(6, 'Old Name', 'Trophy', 'Junk', 0))
+    local.add(item(6, 'New Name', 'Trophy', 'Junk', 0))
+
+    assert len(local) == 1
+    assert local.query(prefix='old') == []
+    assert local.query(name='new name')[0].id == 6
+
+    local.remove(6)
+    assert local.query(type='Trophy') == []
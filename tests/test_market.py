@@ -0,0 +1,99 @@
+import pytest
+from gw2apiwrapper.market import (OrderBook, PriceHistory, PriceSnapshot,
+                                  flips, sellerGets)
+
+
+def price(id, buy, sell, whitelisted=True):
+    return {'id': id, 'whitelisted': whitelisted,
+            'buys': {'unit_price': buy, 'quantity': 10},
+            'sells': {'unit_price': sell, 'quantity': 5}}
+
+
+def test_orderBook():
+    book = OrderBook({'id': 19721,
+                      'buys': [{'listings': 1, 'unit_price': 90,
+                                'quantity': 5},
+                               {'listings': 3, 'unit_price': 80,
+                                'quantity': 20}],
+                      'sells': [{'listings': 2, 'unit_price': 100,
+                                 'quantity': 10},
+                                {'listings': 1, 'unit_price': 120,
+                                 'quantity': 7}]})
+
+    assert (book.bestBuy, book.bestSell) == (90, 100)
+    assert book.depthAt(99) == 0
+    assert book.depthAt(110) == 10 and book.depthAt(500) == 17
+    assert book.depthAt(85, 'buys') == 5 and book.depthAt(80, 'buys') == 25
+    assert book.depthAt(91, 'buys') == 0
+
+    newer = OrderBook({'id': 19721,
+                       'buys': [{'unit_price': 90, 'quantity': 5},
+                                {'unit_price': 85, 'quantity': 1}],
+                       'sells': [{'unit_price': 100, 'quantity': 4},
+                                 {'unit_price': 120, 'quantity': 7}]})
+
+    assert newer.diff(book) == {'buys': [(80, 20, 0), (85, 0, 1)],
+                                'sells': [(100, 10, 4)]}
+    assert book.diff(book) == {'buys': [], 'sells': []}
+
+
+def test_snapshot():
+    np = pytest.importorskip('numpy')
+
+    snap = PriceSnapshot([price(30, 100, 150), price(10, 0, 40),
+                          price(20, 50, 55, False)], taken=1)
+
+    assert list(snap.ids) == [10, 20, 30]
+    assert snap.index(20) == 1 and snap.index(25) == -1
+    assert 30 in snap and 31 not in snap
+    assert list(snap.indices([30, 5, 10, 99])) == [2, -1, 0, -1]
+    assert snap.get(20)['whitelisted'] is False
+    assert snap.get(30)['sells'] == {'unit_price': 150, 'quantity': 5}
+
+    assert list(snap.spread) == [40, 5, 50]
+    assert np.isnan(snap.roi[0]) and snap.roi[2] == 0.5
+    assert list(snap.volume) == [15, 15, 15]
+
+
+def test_history(tmp_path):
+    pytest.importorskip('numpy')
+    history = PriceHistory(str(tmp_path))
+    day = 86400
+
+    # Two snapshots one day, one the next.
+    for taken, buy in ((day, 100), (day + 60, 110), (2 * day + 5, 120)):
+        history.append(PriceSnapshot([price(20, buy, buy + 9),
+                                      price(10, buy // 2, buy)],
+                                     taken=taken))
+
+    assert len(history.days()) == 2
+
+    rows = history.series(20)
+    assert list(rows['time']) == [day, day + 60, 2 * day + 5]
+    assert list(rows['buyPrice']) == [100, 110, 120]
+    assert len(history.series(20, day + 1, 2 * day)) == 1
+    assert len(history.series(99)) == 0
+
+    # Latest at or before the time, across days too.
+    assert list(history.at(day + 59)['buyPrice']) == [50, 100]
+    assert list(history.at(2 * day)['id']) == [10, 20]
+    assert history.at(day - 1) is None
+
+
+def test_flips():
+    pytest.importorskip('numpy')
+    snap = PriceSnapshot([price(1, 100, 200), price(2, 1000, 1300),
+                          price(3, 10, 11), price(4, 0, 500),
+                          price(5, 50, 90, False)])
+
+    # 200 sells for 200 - 10 - 20 = 170.
+    assert list(sellerGets([200, 1, 10])) == [170, -1, 8]
+
+    ranked = flips(snap)
+    assert [x['id'] for x in ranked] == [2, 1, 5]
+    assert ranked[1]['profit'] == 70 and ranked[1]['roi'] == 0.7
+
+    assert [x['id'] for x in flips(snap, by='roi')] == [1, 5, 2]
+    assert [x['id'] for x in flips(snap, top=2)] == [2, 1]
+    assert [x['id'] for x in flips(snap, whitelisted=True, maxBuy=500)] == [1]
+    assert flips(snap, minROI=1) == []
@@ -11,7 +11,7 @@ def test_badUrl():
         api.getGuild('ERROR')
 
     # Test for invalid permission exception
-    with pytest.raises(TypeError):
+    with pytest.raises(PermissionError):
         api = AccountAPI('NOT A REAL KEY')
 
 
@@ -84,3 +84,20 @@ def test_getEmblem():
     for layer in getEm:
         assert type(layer) is dict
         assert len(layer) >= 2
+
+
+def test_getJsonMeta():
+    url = 'https://api.guildwars2.com/v2/items?page=0&page_size=50'
+    response = functions.getJson(url, meta=True)
+
+    assert response.status == 200
+    assert len(response.data) == response.resultCount == 50
+    assert response.pageSize == 50
+    assert response.pageTotal * 50 >= response.resultTotal
+
+    # Partial results are flagged.
+    url = 'https://api.guildwars2.com/v2/items?ids=12452,1'
+    assert functions.getJson(url, meta=True).partial is True
+
+    # Plain JSON by default.
+    assert type(functions.getJson(url)) is list
@@ -0,0 +1,47 @@
+from gw2apiwrapper import functions, records
+from gw2apiwrapper.recipes import CraftingCost, RecipeGraph
+
+
+def recipe(id, output, ingredients, count=1):
+    return records.build('Recipe', {'id': id, 'output_item_id': output,
+                                    'output_item_count': count,
+                                    'ingredients': ingredients})
+
+
+def graph():
+    return RecipeGraph([
+        # Two ore make an ingot, old style ingredients.
+        recipe(1, 100, [{'item_id': 10, 'count': 2}]),
+        # Ingot and some currency make a sword, new style.
+        recipe(2, 200, [{'type': 'Item', 'id': 100, 'count': 3},
+                        {'type': 'Currency', 'id': 1, 'count': 50}]),
+        # Ingots back into ore. A cycle.
+        recipe(3, 10, [{'item_id': 100, 'count': 1}]),
+    ])
+
+
+def test_search():
+    recipes = graph()
+
+    assert recipes.search('output', 100) == [1]
+    assert recipes.search('input', 100) == [2, 3]
+    assert recipes.search('input', 1) == []
+    assert functions.recipeSearch('output', 200, graph=recipes) == [2]
+
+
+def test_cost():
+    cost = CraftingCost(graph(), {10: 5, 100: 15, 200: 100})
+
+    ingot = cost.decide(100)
+    assert ingot['best'] == 'craft' and ingot['cost'] == 10
+    assert ingot['recipe'] == 1
+
+    # Built from the cheaper crafted ingots.
+    sword = cost.decide(200)
+    assert sword['craft'] == 30 and sword['best'] == 'craft'
+
+    # Everything craftable priced, and the cycle didn't hang.
+    assert set(cost.evaluate()) == {10, 100, 200}
+
+    # Unpriced, uncraftable things have no cost at all.
+    assert CraftingCost(graph(), {}).decide(200)['best'] is None
@@ -0,0 +1,50 @@
+import pickle
+from gw2apiwrapper import functions, records
+
+
+def test_schemaCoverage():
+    # Every typer endpoint should build a schema backed object.
+    for entry in functions.crossList.values():
+        assert entry['obj'] in records.schemas
+
+
+def test_build():
+    item = records.build('Item', {'id': 12452, 'name': 'Omnomberry Bar',
+                                  'brand_new_key': True})
+
+    assert type(item).__name__ == 'Item'
+    assert item.name == 'Omnomberry Bar'
+
+    # Missing optional keys are None, unknown keys are kept.
+    assert item.level is None
+    assert item.extra == {'brand_new_key': True}
+
+    # Same type no matter which keys showed up.
+    other = records.build('Item', {'id': 28445, 'level': 80})
+    assert type(other) is type(item)
+    assert other.extra is None
+
+    # Still pickles despite being built on the fly.
+    assert pickle.loads(pickle.dumps(item)) == item
+
+
+def test_buildUnregistered():
+    thing = records.build('Unregistered', {'id': 1, 'name': 'Thing'})
+
+    assert type(thing).__name__ == 'Unregistered'
+    assert thing._asdict() == {'id': 1, 'name': 'Thing'}
+
+
+def test_tupleCompat():
+    perm = records.build('GuildPermission', {'id': 'Admin', 'name': 'Boss'})
+    fields = records.schemas['GuildPermission']
+
+    assert len(perm) == len(fields)
+    assert perm[0] == getattr(perm, fields[0])
+    assert perm[-1] == getattr(perm, fields[-1])
+    assert perm[:2] == tuple(perm)[:2]
+    assert perm == tuple(perm)
+
+    # Hashable like a namedtuple, so long as the fields are.
+    assert hash(perm) == hash(tuple(perm))
+    assert len({perm, records.build('GuildPermission', perm._asdict())}) == 1
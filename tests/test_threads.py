@@ -0,0 +1,73 @@
+import threading
+from gw2apiwrapper import threads
+
+
+def blocked(executor, gate):
+    '''
+    Submit to executor from another thread; returns an Event set
+    once submit() comes back.
+    '''
+    submitted = threading.Event()
+
+    def submit():
+        executor.submit(gate.wait, 5)
+        submitted.set()
+
+    threading.Thread(target=submit, daemon=True).start()
+    return submitted
+
+
+def test_submitBlocks():
+    executor = threads.BoundedExecutor(max_workers=1, max_queued=1)
+    gate = threading.Event()
+
+    # One running, one waiting: full.
+    executor.submit(gate.wait, 5)
+    executor.submit(gate.wait, 5)
+
+    submitted = blocked(executor, gate)
+    assert not submitted.wait(0.2)
+
+    # Finishing frees the slots.
+    gate.set()
+    assert submitted.wait(5)
+    executor.shutdown()
+
+
+def test_cancelReleases():
+    executor = threads.BoundedExecutor(max_workers=1, max_queued=1)
+    gate = threading.Event()
+
+    executor.submit(gate.wait, 5)
+    queued = executor.submit(gate.wait, 5)
+
+    submitted = blocked(executor, gate)
+    assert not submitted.wait(0.2)
+
+    assert queued.cancel()
+    assert submitted.wait(5)
+
+    gate.set()
+    executor.shutdown()
+
+
+def test_configure(monkeypatch):
+    monkeypatch.setattr(threads, 'shared', threads.BoundedExecutor())
+    old = threads.shared
+
+    threads.configure(max_workers=2, max_queued=3)
+    assert threads.shared is not old
+    assert (threads.shared.max_workers, threads.shared.max_queued) == (2, 3)
+
+    # Clients without their own executor follow along.
+    class Client:
+        executor = None
+
+    assert threads.getExecutor(Client()) is threads.shared
+
+    own = threads.BoundedExecutor(max_workers=1)
+    Client.executor = own
+    assert threads.getExecutor(Client()) is own
+
+    threads.shared.shutdown()
+    own.shutdown()
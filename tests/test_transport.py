@@ -0,0 +1,239 @@
+import time
+import threading
+import http.client
+import email.utils
+import pytest
+from http.client import HTTPMessage
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from gw2apiwrapper import transport
+from gw2apiwrapper.transport import Response
+
+URL = 'https://api.guildwars2.com/v2/items'
+
+
+def response(status=200, headers=()):
+    message = HTTPMessage()
+    for name, value in headers:
+        message[name] = value
+
+    return Response(status, 'Fake', message, b'[]')
+
+
+class FakePool:
+    '''
+    Stands in for transport.pool, answering with whatever's next
+    in outcomes: a Response to return or an exception to raise.
+    '''
+    def __init__(self, *outcomes):
+        self.outcomes = list(outcomes)
+        self.calls = 0
+
+    def request(self, url, header=None):
+        self.calls += 1
+        outcome = self.outcomes.pop(0)
+        if isinstance(outcome, BaseException):
+            raise outcome
+        return outcome
+
+
+class FakeLimiter:
+    def __init__(self):
+        self.pauses = []
+
+    def acquire(self):
+        pass
+
+    def pause(self, seconds):
+        self.pauses.append(seconds)
+
+
+@pytest.fixture
+def limiter(monkeypatch):
+    fake = FakeLimiter()
+    monkeypatch.setattr(transport, 'limiter', fake)
+    monkeypatch.setattr(transport, 'backoff', 0)
+    monkeypatch.setattr(transport, 'coalesce', False)
+    return fake
+
+
+def test_retries(limiter, monkeypatch):
+    pool = FakePool(ConnectionResetError(), http.client.IncompleteRead(b''),
+                    http.client.BadStatusLine(''), response(503),
+                    response(200))
+    monkeypatch.setattr(transport, 'pool', pool)
+
+    assert transport.fetch(URL).status == 200
+    assert pool.calls == 5
+
+    # Out of retries.
+    pool = FakePool(*[response(502)] * (transport.retries + 1))
+    monkeypatch.setattr(transport, 'pool', pool)
+    with pytest.raises(ConnectionError):
+        transport.fetch(URL)
+
+    # Client errors are the caller's to deal with.
+    pool = FakePool(response(404))
+    monkeypatch.setattr(transport, 'pool', pool)
+    assert transport.fetch(URL).status == 404
+    assert pool.calls == 1
+
+
+def test_tooManyRequests(limiter, monkeypatch):
+    pool = FakePool(response(429, [('Retry-After', '0')]), response(200))
+    monkeypatch.setattr(transport, 'pool', pool)
+
+    # A 429 holds every request, not just this one.
+    assert transport.fetch(URL).status == 200
+    assert limiter.pauses == [0.0]
+
+
+def test_retryAfter():
+    later = email.utils.formatdate(time.time() + 60, usegmt=True)
+
+    assert transport.retryDelay(response(503, [('Retry-After', '7')]), 0) == 7
+    assert 50 < transport.retryDelay(
+        response(429, [('Retry-After', later)]), 0
+    ) <= 60
+
+    # Nothing usable: backoff, up to twice as long per attempt.
+    for headers in ((), [('Retry-After', 'soon')]):
+        delay = transport.retryDelay(response(503, headers), 2)
+        assert 0 <= delay <= transport.backoff * 4
+
+    assert transport.retryDelay(response(200), 0) is None
+    assert transport.retryDelay(response(404), 0) is None
+
+
+def test_rateLimiter():
+    limiter = transport.RateLimiter(rate=10, per=1, burst=2)
+
+    assert limiter.reserve() == 0 and limiter.reserve() == 0
+    assert 0 < limiter.reserve() <= 0.1
+
+    limiter.pause(5)
+    assert 4.9 < limiter.reserve() <= 5
+
+    assert transport.RateLimiter().burst == 300
+    assert transport.RateLimiter(burst=None).burst == 600
+
+
+def test_singleFlight():
+    flights = transport.SingleFlight()
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    def work(fail):
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        if fail:
+            raise ValueError('nope')
+        return object()
+
+    def run(fail):
+        results = []
+
+        def caller():
+            try:
+                results.append(flights.do('key', work, fail))
+            except ValueError as e:
+                results.append(e)
+
+        threads = [threading.Thread(target=caller) for x in range(8)]
+        threads[0].start()
+        started.wait(5)
+        for thread in threads[1:]:
+            thread.start()
+
+        # Let the followers line up behind the leader.
+        time.sleep(0.1)
+        release.set()
+        for thread in threads:
+            thread.join(5)
+
+        started.clear()
+        release.clear()
+        return results
+
+    results = run(False)
+    assert len(calls) == 1 and len(results) == 8
+    assert all(x is results[0] for x in results)
+
+    # Everyone shares the exception too, then the key is free again.
+    calls.clear()
+    results = run(True)
+    assert len(calls) == 1 and len(results) == 8
+    assert all(x is results[0] for x in results)
+    assert isinstance(results[0], ValueError)
+
+
+class Handler(BaseHTTPRequestHandler):
+    '''
+    Keep-alive HTTP/1.1 that answers every GET with the port the
+    request came from, so tests can tell connections apart.
+    /drop says keep-alive but hangs up anyway, like a server
+    timing out an idle connection.
+    '''
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        body = str(self.client_address[1]).encode('UTF-8')
+
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+        if self.path == '/drop':
+            self.close_connection = True
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=httpd.serve_forever, args=(0.05,),
+                     daemon=True).start()
+
+    yield 'http://127.0.0.1:{}'.format(httpd.server_address[1])
+
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def test_poolReuse(server):
+    pool = transport.ConnectionPool(maxsize=2)
+
+    first = pool.request(server + '/a').body
+    assert pool.request(server + '/b').body == first
+
+    pool.clear()
+    assert pool.request(server + '/c').body != first
+
+
+def test_poolStale(server):
+    pool = transport.ConnectionPool(maxsize=2)
+    dropped = pool.request(server + '/drop').body
+
+    # The pooled connection is dead; we quietly get a new one.
+    response = pool.request(server + '/a')
+    assert response.status == 200 and response.body != dropped
+
+
+def test_poolMaxsize(server):
+    pool = transport.ConnectionPool(maxsize=1)
+    key = ('http', '127.0.0.1', int(server.rsplit(':', 1)[1]))
+
+    kept, extra = pool._checkout(key)[0], pool._checkout(key)[0]
+    for conn in (kept, extra):
+        conn.connect()
+        pool._checkin(key, conn)
+
+    # Only one idle connection per host; the other got closed.
+    assert pool._idle[key] == [kept]
+    assert kept.sock is not None and extra.sock is None
+
+    assert transport.ConnectionPool().maxsize >= 16